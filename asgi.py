@@ -0,0 +1,94 @@
+"""
+ASGI entry point serving the webhook without blocking a thread per request.
+
+    uvicorn asgi:app --port 8000
+
+The LINE configuration, webhook parser, scheduler and Firebase app are the ones
+set up by ``main``; only the request handling and the outbound I/O (utils.aio) are
+asynchronous.
+"""
+
+import contextlib
+
+from linebot.v3.exceptions import (
+    InvalidSignatureError
+)
+from linebot.v3.webhooks import (
+    FollowEvent,
+    MessageEvent,
+    TextMessageContent,
+    UnfollowEvent,
+)
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+import config.settings as settings
+import main
+import utils.aio as aio
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await aio.start(main.configuration)
+    try:
+        yield
+    finally:
+        await aio.close()
+
+
+async def home(request):
+    return JSONResponse(main.home())
+
+
+async def callback(request):
+    # get X-Line-Signature header value
+    signature = request.headers.get('X-Line-Signature', '')
+
+    # get request body as text
+    body = (await request.body()).decode()
+    main.app.logger.info("Request body: " + body)
+
+    try:
+        payload = main.parser.parse(body, signature, as_payload=True)
+    except InvalidSignatureError:
+        main.app.logger.info("Invalid signature. Please check your channel access token/channel secret.")
+        return PlainTextResponse('Bad Request', status_code=400)
+
+    # Acknowledge first and reply in the background, like the threaded dispatcher does.
+    if settings.WEBHOOK_ASYNC:
+        return PlainTextResponse('OK', background=BackgroundTask(dispatch_events, payload.events))
+
+    await dispatch_events(payload.events)
+    return PlainTextResponse('OK')
+
+
+async def webhook_stats(request):
+    return JSONResponse(main.webhook_stats())
+
+
+async def dispatch_events(events):
+    # Message events of one body are answered together from a single carousel render.
+    messages = []
+    for event in events:
+        if isinstance(event, MessageEvent) and isinstance(event.message, TextMessageContent):
+            messages.append(event)
+        elif isinstance(event, FollowEvent):
+            await run_in_threadpool(main.handle_follow, event)
+        elif isinstance(event, UnfollowEvent):
+            await run_in_threadpool(main.handle_unfollow, event)
+
+    if messages:
+        await aio.reply_to_events(messages)
+
+
+app = Starlette(
+    routes=[
+        Route('/', home, methods=['GET']),
+        Route(f'{main.base_api}/callback', callback, methods=['POST']),
+        Route(f'{main.base_api}/webhook/stats', webhook_stats, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,156 @@
+"""
+Benchmark of the fetch -> extract -> render -> send pipeline.
+
+Runs every stage of ``generate_carousel_content`` and ``task_alert_trade`` against the
+recorded scanner fixture (scaled to ``--symbols`` rows) and a local LINE API stand-in,
+and prints per-stage latency and throughput as JSON for regression tracking.
+
+Usage:
+    python -m benchmarks.pipeline --symbols 500 --repeat 20 --output bench.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import string
+import sys
+import time
+
+from linebot.v3.messaging import Configuration, FlexContainer
+
+import config.settings as settings
+import flex.template as template
+import utils.functions as func
+import utils.markets as markets
+import utils.paging as paging
+from benchmarks.stub import StubServer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'scanner_forex.json')
+
+
+def load_fixture(symbols=None) -> dict:
+    """
+    Load the recorded scanner response, scaled to ``symbols`` rows.
+
+    Extra rows reuse the recorded indicator values under synthetic currency codes
+    (registered in settings.CURRENCY) so every row stays a distinct, describable pair.
+    """
+    with open(FIXTURE) as f:
+        recorded = json.load(f)['data']
+
+    if not symbols or symbols <= len(recorded):
+        rows = recorded[:symbols] if symbols else recorded
+        return {'totalCount': len(rows), 'data': rows}
+
+    codes = (''.join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=3))
+    codes = (code for code in codes if code not in settings.CURRENCY)
+
+    rows = list(recorded)
+    for entry, code in zip(itertools.cycle(recorded), codes):
+        if len(rows) == symbols:
+            break
+        settings.CURRENCY[code] = f'Synthetic {code}'
+        rows.append({'s': f'{settings.PREFIX}{code}USD', 'd': entry['d']})
+
+    return {'totalCount': len(rows), 'data': rows}
+
+
+def measure(fn, repeat, items=1) -> dict:
+    """
+    Call ``fn`` ``repeat`` times and summarize the latency of one call.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    mean = statistics.mean(timings)
+    return {
+        'calls': repeat,
+        'items_per_call': items,
+        'mean_ms': mean * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        'min_ms': timings[0] * 1000,
+        'items_per_s': items / mean if mean else None,
+    }
+
+
+def run(symbols, repeat, latency=0.0) -> dict:
+    data = load_fixture(symbols)
+    body = json.dumps(data).encode()
+
+    with StubServer(body, latency=latency) as stub:
+        markets.get('forex').endpoint = f'{stub.url}/forex/scan'
+        func.configure_line_client(Configuration(host=stub.url, access_token='benchmark'))
+
+        info = func.extract_forex_info(data)
+        rendered = [func._render_bubble(i) for i in info.values()]
+        bubbles = [func.get_payload_for_bubble(i, dict) for i in info.values()]
+        alerts = [
+            {'symbol': i.symbol, 'signal': '⬆' if i.signal == 'UP TREND' else '⬇', 'description': i.description}
+            for i in info.values()
+        ]
+        carousels = func.generate_carousels(info.values())
+
+        def pipeline():
+            content = func.generate_carousels(func.extract_forex_info(func.fetch_scanner_data()).values())
+            func.compile_message('benchmark-user', content, is_task=True)
+
+        stages = {
+            'fetch_scanner_data': measure(func.fetch_scanner_data, repeat, len(data['data'])),
+            'extract_forex_info': measure(lambda: func.extract_forex_info(data), repeat, len(data['data'])),
+            'paging.paginate': measure(lambda: list(paging.paginate(rendered)), repeat, len(rendered)),
+            'template.generate_bubble_string': measure(
+                lambda: [template.generate_bubble_string(bubble) for bubble in bubbles], repeat, len(bubbles)),
+            'template.alert_indicator': measure(
+                lambda: [template.alert_indicator(alert) for alert in alerts], repeat, len(alerts)),
+            'generate_carousels': measure(lambda: func.generate_carousels(info.values()), repeat, len(info)),
+            'FlexContainer.from_json': measure(
+                lambda: [FlexContainer.from_json(carousel) for carousel in carousels], repeat, len(carousels)),
+            'compile_message': measure(
+                lambda: func.compile_message('benchmark-user', carousels, is_task=True), repeat, len(carousels)),
+            'pipeline': measure(pipeline, repeat, len(data['data'])),
+        }
+
+        return {
+            'meta': {
+                'symbols': len(data['data']),
+                'signals': len(info),
+                'carousels': len(carousels),
+                'repeat': repeat,
+                'stub_latency_ms': latency * 1000,
+                'python': platform.python_version(),
+                'vectorized_engine': settings.VECTORIZED_ENGINE,
+                'timestamp': time.time(),
+            },
+            'stages': stages,
+            'stub_requests': dict(stub.requests),
+            'stub_bytes_received': stub.bytes_received,
+            'line_client_pool': func.get_line_client_pool().stats(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--symbols', type=int, default=None, help='Scale the fixture to this many rows.')
+    parser.add_argument('--repeat', type=int, default=10, help='Calls per stage.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Artificial stub latency in seconds.')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run(args.symbols, args.repeat, args.latency), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
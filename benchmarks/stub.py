@@ -0,0 +1,73 @@
+"""
+Local stand-in for the TradingView scanner and the LINE Messaging API.
+
+Serves the scanner fixture on ``/forex/scan`` and accepts reply, push and multicast
+calls on ``/v2/bot/message/*``, optionally after an artificial latency, so the
+pipeline can be benchmarked without touching the real services.
+"""
+
+import collections
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LINE_RESPONSE = b'{"sentMessages": [{"id": "0", "quoteToken": "benchmark"}]}'
+
+
+class StubServer:
+    def __init__(self, scanner_body: bytes, latency=0.0):
+        self.scanner_body = scanner_body
+        self.latency = latency
+        self.requests = collections.Counter()
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _record(self, path, size):
+        with self._lock:
+            self.requests[path] += 1
+            self.bytes_received += size
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self._reply(b'{}')
+
+            def do_POST(self):
+                size = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(size)
+                stub._record(self.path, size)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                self._reply(stub.scanner_body if self.path.endswith('/scan') else LINE_RESPONSE)
+
+            def _reply(self, body):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
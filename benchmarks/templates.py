@@ -0,0 +1,95 @@
+"""
+Benchmark of precompiled Flex templates against the dict-building templates.
+
+Renders every signal of the scanner fixture as a bubble JSON string both ways
+(``json.dumps(template.generate_bubble_string(...))`` vs ``compiler.render_bubble``),
+does the same for alert bubbles and whole carousels, checks the outputs are
+equivalent and prints the timings and speedups as JSON.
+
+The precompiled row is timed with the render cache disabled; when the cache is
+configured, its warm path is reported as its own ``precompiled_cached`` row.
+
+Usage:
+    python -m benchmarks.templates --symbols 500 --repeat 20
+"""
+
+import argparse
+import json
+import sys
+
+import flex.compiler as compiler
+import flex.template as template
+import utils.functions as func
+from benchmarks.pipeline import load_fixture, measure
+
+
+def run(symbols, repeat) -> dict:
+    info = func.extract_forex_info(load_fixture(symbols))
+    bubbles = [func.get_payload_for_bubble(i, dict) for i in info.values()]
+    alerts = [
+        {'symbol': i.symbol, 'signal': '⬆' if i.signal == 'UP TREND' else '⬇', 'description': i.description}
+        for i in info.values()
+    ]
+
+    cases = {
+        'bubble': (
+            lambda: [json.dumps(template.generate_bubble_string(bubble)) for bubble in bubbles],
+            lambda: [compiler.render_bubble(bubble) for bubble in bubbles],
+            len(bubbles),
+        ),
+        'alert': (
+            lambda: [json.dumps(template.alert_indicator(alert)) for alert in alerts],
+            lambda: [compiler.render_alert(alert) for alert in alerts],
+            len(alerts),
+        ),
+        'carousel': (
+            lambda: json.dumps({'type': 'carousel', 'contents': [template.generate_bubble_string(b) for b in bubbles]}),
+            lambda: compiler.render_carousel(compiler.render_bubble(b) for b in bubbles),
+            len(bubbles),
+        ),
+    }
+
+    def check():
+        for bubble, alert in zip(bubbles, alerts):
+            assert json.loads(compiler.render_bubble(bubble)) == template.generate_bubble_string(bubble)
+            assert json.loads(compiler.render_alert(alert)) == template.alert_indicator(alert)
+
+    # Time the precompiled templates themselves, without the render cache.
+    cache, compiler.render_cache = compiler.render_cache, None
+    try:
+        check()
+        results = {}
+        for name, (baseline, compiled, items) in cases.items():
+            before = measure(baseline, repeat, items)
+            after = measure(compiled, repeat, items)
+            results[name] = {
+                'dict_template': before,
+                'precompiled': after,
+                'speedup': before['mean_ms'] / after['mean_ms'],
+            }
+    finally:
+        compiler.render_cache = cache
+
+    if cache is not None:
+        # Warm the cache from empty, then time the cached path.
+        cache.clear()
+        check()
+        for name, (_, compiled, items) in cases.items():
+            cached = measure(compiled, repeat, items)
+            results[name]['precompiled_cached'] = cached
+            results[name]['cached_speedup'] = results[name]['dict_template']['mean_ms'] / cached['mean_ms']
+
+    return {'meta': {'signals': len(bubbles), 'repeat': repeat}, 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--symbols', type=int, default=None, help='Scale the fixture to this many rows.')
+    parser.add_argument('--repeat', type=int, default=10, help='Calls per case.')
+    args = parser.parse_args(argv)
+
+    sys.stdout.write(json.dumps(run(args.symbols, args.repeat), indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
 TRADINGVIEW = 'https://scanner.tradingview.com/forex/scan'
+TRADINGVIEW_CRYPTO = 'https://scanner.tradingview.com/crypto/scan'
+TRADINGVIEW_AMERICA = 'https://scanner.tradingview.com/america/scan'
 WEBSERVER = 'https://kernel-yq36.onrender.com'
 WEBHOOK = 'https://kernel-yq36.onrender.com/api/callback'
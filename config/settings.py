@@ -16,6 +16,92 @@ TIME_ZONE = 'Asia/Bangkok'
 
 # Line developer max corousel contents
 MAXIMUM_ITEMS = 12
+# LINE's limits on the JSON size of one bubble and of one carousel, in bytes.
+FLEX_BUBBLE_MAX_BYTES = 30 * 1000
+FLEX_CAROUSEL_MAX_BYTES = 50 * 1000
+# LINE accepts at most this many messages per reply, push or multicast request.
+MESSAGES_PER_REQUEST = 5
+
+# Render bubbles from precompiled JSON skeletons (flex/compiler.py) instead of building nested dicts.
+FLEX_PRECOMPILED = True
+# Send rendered carousel JSON to the LINE API as is, skipping the FlexContainer parse and validation.
+FLEX_RAW_DELIVERY = True
+# Memory cap of the LRU cache of rendered bubbles reused across ticks (0 disables the cache).
+BUBBLE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Scanner snapshot cache
+# Seconds a TradingView scanner response is served as fresh to every caller (webhook and scheduler).
+SNAPSHOT_TTL = 30
+# Seconds past the TTL during which the stale snapshot is still served while a background refresh runs.
+SNAPSHOT_STALE_TTL = 90
+# Decode the webhook's scanner response row by row while it downloads, instead of through the snapshot cache.
+SCANNER_STREAMING = False
+SCANNER_STREAM_CHUNK_SIZE = 16 * 1024
+# Split the ticker list into scanner requests of at most this many tickers (None sends a single request).
+SCANNER_SHARD_SIZE = None
+# Maximum number of shard requests in flight.
+SCANNER_SHARD_CONCURRENCY = 4
+
+# Multi-process deployments (e.g. gunicorn with several workers)
+# Memory-mapped file (preferably under /dev/shm) through which the one process elected to fetch
+# shares its scanner snapshots and runs the scheduler; None makes every process fetch on its own.
+SHARED_SNAPSHOT_PATH = None
+SHARED_SNAPSHOT_SIZE = 8 * 1024 * 1024
+# Seconds a non-owner process reuses what it read from the shared snapshot.
+SHARED_SNAPSHOT_POLL = 1
+# Seconds a non-owner process waits for the first snapshot of a market to be published.
+SHARED_SNAPSHOT_WAIT = 10
+
+# Carousel prefetcher
+# Seconds between background refreshes of the pre-rendered webhook carousel.
+CAROUSEL_PREFETCH_INTERVAL = 20
+# A pre-rendered carousel older than this (in seconds) is re-rendered before replying.
+CAROUSEL_BUNDLE_MAX_AGE = 60
+
+# Webhook dispatching
+# When enabled the callback acknowledges LINE right after signature verification and
+# handles the events on a pool of background workers.
+WEBHOOK_ASYNC = False
+WEBHOOK_WORKERS = 4
+# Maximum number of queued webhook bodies; beyond this the callback answers 503.
+WEBHOOK_QUEUE_SIZE = 100
+# Seconds to wait for queued webhooks to drain on shutdown.
+WEBHOOK_DRAIN_TIMEOUT = 30
+# Seconds during which message events of consecutive webhooks are collected and answered
+# together, with a single carousel render (0 answers every webhook body on its own).
+WEBHOOK_BATCH_WINDOW = 0
+
+# LINE client pool
+# Maximum number of MessagingApi clients (each with its own keep-alive connection pool).
+LINE_CLIENT_POOL_SIZE = 8
+# Seconds an idle client is kept before it is recycled.
+LINE_CLIENT_MAX_IDLE = 240
+# Seconds after which a client is recycled regardless of use.
+LINE_CLIENT_MAX_LIFETIME = 3600
+
+# Outbound HTTP (TradingView scanner, keep-alive pings)
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 15
+HTTP_POOL_SIZE = 10
+HTTP_RETRIES = 3
+# Base backoff in seconds; retry n waits roughly backoff * 2 ** (n - 1) plus up to the same amount of jitter.
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Message delivery
+# Maximum number of LINE API calls in flight for one compile_message call.
+DELIVERY_CONCURRENCY = 4
+# Send the messages for the same recipient one after another so they arrive in order.
+DELIVERY_PRESERVE_ORDER = True
+
+# Alert broadcasting
+# Users that always receive alerts, in addition to those who followed the bot.
+SUBSCRIBERS = [ADMIN_ID]
+# LINE accepts at most 500 recipients per multicast request.
+MULTICAST_MAX_RECIPIENTS = 500
+MULTICAST_CONCURRENCY = 8
+# Maximum multicast requests per second of one process (each worker applies it on its own).
+MULTICAST_RATE_LIMIT = 100
 
 # Constant
 
@@ -28,6 +114,21 @@ OVERSOLD = 30
 
 ALERT_VALUE_INDICATOR = 4
 
+# Alert engine
+# Only push alerts for symbols that entered, flipped or exited the alert condition since the last run.
+ALERT_ONLY_CHANGES = True
+# An active alert only exits once fewer than (alert value - hysteresis) timeframes agree with it.
+ALERT_HYSTERESIS = 1
+# Minimum seconds between two alert pushes for the same symbol.
+ALERT_COOLDOWN = 15 * 60
+# JSON file the alert state is persisted to between restarts, None to keep it in memory only.
+ALERT_STATE_FILE = None
+# Seconds between Firestore polls of the alert configuration while no snapshot listener is delivering updates.
+ALERT_CONFIG_TTL = 300
+
+# Evaluate the scanner response as one NumPy matrix instead of row by row.
+VECTORIZED_ENGINE = True
+
 INTERVAL = ['M1', 'M5', 'M15', 'M30', 'H1', 'H2', 'H4', 'D1']
 
 PREFIX = 'FX_IDC:'
@@ -74,16 +175,60 @@ FOREX_GROUP = [
     'USDJPY',
 ]
 
-# A mapping of timeframes to their respective index ranges in the indicator list
-INDICATOR_INTERVAL_RANGE = {
-    'M1': (16, 22),
-    'M5': (22, 28),
-    'M15': (28, 34),
-    'M30': (34, 40),
-    'H1': (40, 46),
-    'H2': (46, 52),
-    'H4': (52, 58),
-    'D1': (58, 64)
+# Markets scanned by the webhook and the alert task (see utils/markets.py).
+MARKETS = ['forex']
+
+CRYPTO_PREFIX = 'BINANCE:'
+
+CRYPTO = {
+    'BTC': 'Bitcoin',
+    'ETH': 'Ethereum',
+    'BNB': 'BNB',
+    'SOL': 'Solana',
+    'XRP': 'XRP',
+    'ADA': 'Cardano',
+    'DOGE': 'Dogecoin',
+    'USDT': 'Tether',
+}
+
+# Quote currencies crypto tickers may end with, longest first.
+CRYPTO_QUOTES = ['USDT', 'BTC', 'ETH']
+
+CRYPTO_GROUP = [
+    'BTCUSDT',
+    'ETHUSDT',
+    'BNBUSDT',
+    'SOLUSDT',
+    'XRPUSDT',
+    'ADAUSDT',
+    'DOGEUSDT',
+    'ETHBTC',
+]
+
+STOCK_PREFIX = 'NASDAQ:'
+
+STOCKS = {
+    'AAPL': 'Apple Inc.',
+    'MSFT': 'Microsoft Corporation',
+    'NVDA': 'NVIDIA Corporation',
+    'AMZN': 'Amazon.com, Inc.',
+    'GOOGL': 'Alphabet Inc.',
+    'META': 'Meta Platforms, Inc.',
+    'TSLA': 'Tesla, Inc.',
+}
+
+STOCK_GROUP = list(STOCKS)
+
+# Scanner column resolution suffix ("RSI|15") of each timeframe; daily columns have no suffix.
+INTERVAL_RESOLUTION = {
+    'M1': '1',
+    'M5': '5',
+    'M15': '15',
+    'M30': '30',
+    'H1': '60',
+    'H2': '120',
+    'H4': '240',
+    'D1': '',
 }
 
 BASE_PAYLOAD = {
@@ -0,0 +1,95 @@
+"""
+Bounded LRU cache of rendered bubble fragments.
+
+Entries are keyed by the inputs a bubble is rendered from, so a symbol whose signal,
+description and levels didn't change since the last tick reuses its previous rendering.
+The cache is capped by the memory held in its entries, keys included.
+"""
+
+import collections
+import sys
+import threading
+
+
+def content_key(kind: str, values) -> tuple:
+    """
+    Key identifying a rendering of ``kind`` from the ``values`` sequence.
+
+    The tuple is hashed by the cache's dict and compared on lookup, so unlike a
+    truncated digest two different inputs can never share an entry.
+    """
+    return (kind, *values)
+
+
+class RenderCache:
+    """
+    LRU mapping of content keys to rendered fragments, evicting the least recently
+    used entries once they hold more than ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.metrics['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.metrics['hits'] += 1
+            return entry[0]
+
+    def put(self, key, fragments):
+        """
+        Store ``fragments`` (a string, or nested tuples of strings) under ``key``.
+        """
+        size = _sizeof(key) + _sizeof(fragments)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (fragments, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.metrics['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.metrics['hits'] + self.metrics['misses']
+            return {
+                **self.metrics,
+                'hit_ratio': self.metrics['hits'] / lookups if lookups else None,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def _sizeof(value) -> int:
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value)
+    return sys.getsizeof(value)
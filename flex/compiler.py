@@ -0,0 +1,137 @@
+"""
+Precompiled Flex bubble templates.
+
+Each layout in ``flex.template`` is serialized once with a marker in every slot and
+split into static JSON fragments. Rendering a bubble is then a join of those fragments
+with the JSON-escaped slot values, instead of building and serializing a nested dict.
+
+Rendered bubbles are also kept in a content-addressed LRU cache (``flex.cache``), with
+the timestamp slot left open, so unchanged symbols aren't rendered again on every tick.
+"""
+
+import json
+import re
+from json.encoder import encode_basestring_ascii
+
+import config.settings as settings
+import flex.template as template
+from flex.cache import RenderCache, content_key
+
+# JSON separators shared by the skeletons and the carousels wrapping them.
+SEPARATORS = (',', ':')
+
+_MARKER = '@@{}@@'
+_MARKER_RE = re.compile(r'"@@(\w+)@@"')
+
+
+class CompiledTemplate:
+    """
+    A Flex layout pre-serialized into static fragments and named string slots.
+    """
+
+    def __init__(self, layout, slot_names):
+        skeleton = json.dumps(layout({name: _MARKER.format(name) for name in slot_names}), separators=SEPARATORS)
+        pieces = _MARKER_RE.split(skeleton)
+
+        # ``pieces`` alternates static JSON and slot names: [static, name, static, name, ..., static].
+        self.fragments = pieces[0::2]
+        self.slots = pieces[1::2]
+
+        unknown = set(self.slots) - set(slot_names)
+        missing = set(slot_names) - set(self.slots)
+        if unknown or missing:
+            raise ValueError(f'Template slots mismatch, unknown: {sorted(unknown)}, unused: {sorted(missing)}')
+
+    def render(self, values: dict) -> str:
+        """
+        Fill every slot with its escaped value and return the bubble JSON.
+        """
+        fragments = self.fragments
+        parts = [fragments[0]]
+        for name, fragment in zip(self.slots, fragments[1:]):
+            parts.append(encode_basestring_ascii(values[name]))
+            parts.append(fragment)
+        return ''.join(parts)
+
+    def freeze(self, values: dict, dynamic=()) -> tuple:
+        """
+        Render every slot except the ``dynamic`` ones.
+
+        Returns:
+            tuple: (static texts, dynamic slot names) to be completed by ``fill``.
+        """
+        texts, names = [], []
+        current = [self.fragments[0]]
+        for name, fragment in zip(self.slots, self.fragments[1:]):
+            if name in dynamic:
+                texts.append(''.join(current))
+                names.append(name)
+                current = [fragment]
+            else:
+                current.append(encode_basestring_ascii(values[name]))
+                current.append(fragment)
+        texts.append(''.join(current))
+        return tuple(texts), tuple(names)
+
+    @staticmethod
+    def fill(frozen: tuple, values: dict) -> str:
+        """
+        Complete a ``freeze`` result with the values of its dynamic slots.
+        """
+        texts, names = frozen
+        parts = [texts[0]]
+        for name, text in zip(names, texts[1:]):
+            parts.append(encode_basestring_ascii(values[name]))
+            parts.append(text)
+        return ''.join(parts)
+
+
+BUBBLE = CompiledTemplate(template.bubble_layout, [
+    'trend', 'trend_color', 'symbol', 'desc', 'timeframe', 'value_width', 'value_color',
+    'R3', 'R2', 'R1', 'S1', 'S2', 'S3', 'timestamp',
+])
+
+ALERT = CompiledTemplate(template.alert_layout, ['symbol', 'description', 'icon', 'background'])
+
+# The info fields each bubble is rendered from, i.e. its cache key.
+BUBBLE_INPUTS = ('signal', 'timeframe', 'value', 'symbol', 'desc', 'R3', 'R2', 'R1', 'S1', 'S2', 'S3')
+ALERT_INPUTS = ('signal', 'symbol', 'description', 'transition')
+
+render_cache = RenderCache(settings.BUBBLE_CACHE_MAX_BYTES) if settings.BUBBLE_CACHE_MAX_BYTES else None
+
+
+def render_bubble(info: dict) -> str:
+    """Precompiled equivalent of ``json.dumps(template.generate_bubble_string(info))``."""
+    if render_cache is None:
+        return BUBBLE.render(template.bubble_slots(info))
+
+    key = content_key('bubble', [info[field] for field in BUBBLE_INPUTS])
+    frozen = render_cache.get(key)
+    if frozen is None:
+        frozen = BUBBLE.freeze(template.bubble_slots(info), dynamic=('timestamp',))
+        render_cache.put(key, frozen)
+    return BUBBLE.fill(frozen, {'timestamp': template.bubble_timestamp()})
+
+
+def render_alert(info: dict) -> str:
+    """Precompiled equivalent of ``json.dumps(template.alert_indicator(info))``."""
+    if render_cache is None:
+        return ALERT.render(template.alert_slots(info))
+
+    key = content_key('alert', [info.get(field) for field in ALERT_INPUTS])
+    rendered = render_cache.get(key)
+    if rendered is None:
+        rendered = ALERT.render(template.alert_slots(info))
+        render_cache.put(key, rendered)
+    return rendered
+
+
+def cache_stats():
+    return render_cache.stats() if render_cache is not None else None
+
+
+def render_carousel(bubbles) -> str:
+    """
+    Wrap already rendered bubble JSON strings into a carousel JSON string.
+    """
+    return '{"type":"carousel","contents":[' + ','.join(bubbles) + ']}'
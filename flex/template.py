@@ -1,17 +1,63 @@
+import time
+
 import config.settings as settings
 from utils import timezone
 
 
 def generate_bubble_string(info: dict) -> dict:
-    symbol = info['symbol']
-    desc = info['desc']
+    return bubble_layout(bubble_slots(info))
+
+
+def bubble_slots(info: dict) -> dict:
+    """
+    Compute the display strings of a signal bubble from its info.
+    """
     trend = info['signal']
     timeframe = info['timeframe']
     value = info['value']
     is_up_trend = bool(trend == 'UP TREND')
 
-    detail = timezone.localtime().strftime("%Y.%m.%d %H.%M")
+    return {
+        'trend': trend,
+        'trend_color': "#1DB446" if is_up_trend else "#f5314b",
+        'symbol': info['symbol'],
+        'desc': info['desc'],
+        'timeframe': f"Timeframe: {timeframe} - {value}%",
+        'value_width': f"{value}%",
+        'value_color': "#2edb02" if float(value) >= settings.OVERBOUGHT else "#ff2424",
+        'R3': info['R3'],
+        'R2': info['R2'],
+        'R1': info['R1'],
+        'S1': info['S1'],
+        'S2': info['S2'],
+        'S3': info['S3'],
+        'timestamp': bubble_timestamp(),
+    }
+
+
+# (minute, text) of the last rendered timestamp.
+_timestamp = (None, None)
+
+
+def bubble_timestamp() -> str:
+    """
+    The timestamp slot of a signal bubble, the only one not derived from its info.
 
+    It has a minute resolution, so it is formatted once per minute.
+    """
+    global _timestamp
+
+    key = int(time.time() // 60)
+    if _timestamp[0] != key:
+        detail = timezone.localtime().strftime("%Y.%m.%d %H.%M")
+        _timestamp = (key, f"#{detail}")
+    return _timestamp[1]
+
+
+def bubble_layout(slots: dict) -> dict:
+    """
+    Signal bubble layout with every variable part taken from ``slots``.
+    """
     bubble_string = {
         "type": "bubble",
         "body": {
@@ -20,28 +66,28 @@ def generate_bubble_string(info: dict) -> dict:
             "contents": [
                 {
                     "type": "text",
-                    "text": trend,
+                    "text": slots['trend'],
                     "weight": "bold",
-                    "color": "#1DB446" if is_up_trend else "#f5314b",
+                    "color": slots['trend_color'],
                     "size": "sm"
                 },
                 {
                     "type": "text",
-                    "text": symbol,
+                    "text": slots['symbol'],
                     "weight": "bold",
                     "size": "xxl",
                     "margin": "md"
                 },
                 {
                     "type": "text",
-                    "text": desc,
+                    "text": slots['desc'],
                     "size": "xs",
                     "color": "#aaaaaa",
                     "wrap": True
                 },
                 {
                     "type": "text",
-                    "text": f"Timeframe: {timeframe} - {value}%",
+                    "text": slots['timeframe'],
                     "color": "#000000",
                     "align": "start",
                     "size": "xs",
@@ -60,8 +106,8 @@ def generate_bubble_string(info: dict) -> dict:
                                     "type": "filler"
                                 }
                             ],
-                            "width": f"{value}%",
-                            "backgroundColor": "#2edb02" if float(value) >= settings.OVERBOUGHT else "#ff2424",
+                            "width": slots['value_width'],
+                            "backgroundColor": slots['value_color'],
                             "height": "6px"
                         }
                     ],
@@ -119,7 +165,7 @@ def generate_bubble_string(info: dict) -> dict:
                                 },
                                 {
                                     "type": "text",
-                                    "text": info['R3'],
+                                    "text": slots['R3'],
                                     "size": "sm",
                                     "color": "#111111",
                                     "align": "end"
@@ -139,7 +185,7 @@ def generate_bubble_string(info: dict) -> dict:
                                 },
                                 {
                                     "type": "text",
-                                    "text": info['R2'],
+                                    "text": slots['R2'],
                                     "size": "sm",
                                     "color": "#111111",
                                     "align": "end"
@@ -159,7 +205,7 @@ def generate_bubble_string(info: dict) -> dict:
                                 },
                                 {
                                     "type": "text",
-                                    "text": info['R1'],
+                                    "text": slots['R1'],
                                     "size": "sm",
                                     "color": "#111111",
                                     "align": "end"
@@ -179,7 +225,7 @@ def generate_bubble_string(info: dict) -> dict:
                                 },
                                 {
                                     "type": "text",
-                                    "text": info['S1'],
+                                    "text": slots['S1'],
                                     "size": "sm",
                                     "color": "#111111",
                                     "align": "end"
@@ -199,7 +245,7 @@ def generate_bubble_string(info: dict) -> dict:
                                 },
                                 {
                                     "type": "text",
-                                    "text": info['S2'],
+                                    "text": slots['S2'],
                                     "size": "sm",
                                     "color": "#111111",
                                     "align": "end"
@@ -219,7 +265,7 @@ def generate_bubble_string(info: dict) -> dict:
                                 },
                                 {
                                     "type": "text",
-                                    "text": info['S3'],
+                                    "text": slots['S3'],
                                     "size": "sm",
                                     "color": "#111111",
                                     "align": "end"
@@ -246,7 +292,7 @@ def generate_bubble_string(info: dict) -> dict:
                         },
                         {
                             "type": "text",
-                            "text": f"#{detail}",
+                            "text": slots['timestamp'],
                             "color": "#aaaaaa",
                             "size": "xs",
                             "align": "end"
@@ -265,8 +311,28 @@ def generate_bubble_string(info: dict) -> dict:
 
 
 def alert_indicator(info):
+    return alert_layout(alert_slots(info))
+
+
+def alert_slots(info: dict) -> dict:
+    """
+    Compute the display strings of an alert bubble from its info.
+    """
     signal_buy = bool(info['signal'] == '⬆')
+    exited = info.get('transition') == 'exited'
+
+    return {
+        'symbol': info['symbol'],
+        'description': f"{info['description']} (cleared)" if exited else info['description'],
+        'icon': settings.ICON_UP if signal_buy else settings.ICON_DOWN,
+        'background': "#8c8c8c" if exited else "#0367D3" if signal_buy else "#d61e34",
+    }
+
 
+def alert_layout(slots: dict) -> dict:
+    """
+    Alert bubble layout with every variable part taken from ``slots``.
+    """
     template = {
         "type": "bubble",
         "size": "mega",
@@ -284,7 +350,7 @@ def alert_indicator(info):
                             "contents": [
                                 {
                                     "type": "text",
-                                    "text": info['symbol'],
+                                    "text": slots['symbol'],
                                     "color": "#ffffff",
                                     "size": "xl",
                                     "flex": 4,
@@ -298,7 +364,7 @@ def alert_indicator(info):
                             "contents": [
                                 {
                                     "type": "text",
-                                    "text": info['description'],
+                                    "text": slots['description'],
                                     "color": "#ffffff66",
                                     "size": "sm"
                                 }
@@ -314,7 +380,7 @@ def alert_indicator(info):
                     "contents": [
                         {
                             "type": "image",
-                            "url": settings.ICON_UP if signal_buy else settings.ICON_DOWN,
+                            "url": slots['icon'],
                             "size": "xxs",
                             "margin": "md"
                         }
@@ -323,7 +389,7 @@ def alert_indicator(info):
                 }
             ],
             "paddingAll": "20px",
-            "backgroundColor": "#0367D3" if signal_buy else "#d61e34",
+            "backgroundColor": slots['background'],
             "spacing": "xs",
             "height": "100px",
             "paddingTop": "22px"
@@ -1,9 +1,12 @@
+import atexit
+import datetime
+
 import firebase_admin
 from apscheduler.schedulers.background import BackgroundScheduler
 from firebase_admin import credentials
 from flask import Flask, request, abort
 from linebot.v3 import (
-    WebhookHandler
+    WebhookParser
 )
 from linebot.v3.exceptions import (
     InvalidSignatureError
@@ -12,26 +15,61 @@ from linebot.v3.messaging import (
     Configuration,
 )
 from linebot.v3.webhooks import (
+    FollowEvent,
     MessageEvent,
-    TextMessageContent
+    TextMessageContent,
+    UnfollowEvent,
 )
 
 import config.settings as settings
+import flex.compiler as compiler
 import utils.functions as func
 import utils.tasks as task
+from utils.dispatcher import EventBatcher, WebhookDispatcher, QueueFullError
+import utils.shared_snapshot as shared_snapshot
+from utils.subscribers import registry
 
 app = Flask(__name__)
 
 base_api = '/api'
 
 configuration = Configuration(access_token=settings.CHANNEL_ACCESS)
-handler = WebhookHandler(settings.CHANNEL_SECRET)
+parser = WebhookParser(settings.CHANNEL_SECRET)
+line_client_pool = func.configure_line_client(configuration)
+atexit.register(line_client_pool.close)
+
+# atexit runs last-registered first: the dispatcher drains into the batcher, then the batcher flushes.
+batcher = EventBatcher(window=settings.WEBHOOK_BATCH_WINDOW, flush=func.reply_to_events)
+atexit.register(batcher.flush)
+
+dispatcher = WebhookDispatcher(workers=settings.WEBHOOK_WORKERS, maxsize=settings.WEBHOOK_QUEUE_SIZE)
+if settings.WEBHOOK_ASYNC:
+    dispatcher.start()
+    atexit.register(dispatcher.shutdown, settings.WEBHOOK_DRAIN_TIMEOUT)
 
 # schedule tasks
 scheduler = BackgroundScheduler()
 scheduler.add_job(func=task.task_set_keep_alive_web_server, trigger="interval", seconds=60)
 scheduler.add_job(func=task.task_alert_trade, trigger="interval", seconds=60)
-scheduler.start()
+scheduler.add_job(func=task.task_prefetch_carousel, trigger="interval", seconds=settings.CAROUSEL_PREFETCH_INTERVAL)
+
+
+def start_publishing():
+    # The other workers have nothing to serve until the first snapshot lands, so publish right away.
+    scheduler.add_job(func=task.task_publish_snapshots, trigger="interval", seconds=settings.SNAPSHOT_TTL,
+                      next_run_time=datetime.datetime.now())
+    scheduler.start()
+
+
+if settings.SHARED_SNAPSHOT_PATH:
+    # Only the process owning the shared snapshot fetches and runs the scheduled tasks.
+    snapshot = shared_snapshot.SharedSnapshot(settings.SHARED_SNAPSHOT_PATH, settings.SHARED_SNAPSHOT_SIZE)
+    snapshot.acquire()
+    shared_snapshot.configure(snapshot, on_takeover=start_publishing)
+    if snapshot.is_owner:
+        start_publishing()
+else:
+    scheduler.start()
 
 # Init firebase
 cred = credentials.Certificate('/etc/secrets/credential.json')
@@ -57,20 +95,59 @@ def callback():
 
     # handle webhook body
     try:
-        handler.handle(body, signature)
+        payload = parser.parse(body, signature, as_payload=True)
+        if settings.WEBHOOK_ASYNC:
+            dispatcher.submit(dispatch_events, payload.events)
+        else:
+            dispatch_events(payload.events)
     except InvalidSignatureError:
         app.logger.info("Invalid signature. Please check your channel access token/channel secret.")
         abort(400)
+    except QueueFullError as e:
+        app.logger.warning(f"{e} Stats: {dispatcher.stats()}")
+        abort(503)
 
     return 'OK'
 
 
-@handler.add(MessageEvent, message=TextMessageContent)
-def handle_message(event):
-    # You can read more type message event
-    # source: # source: https://saixiii.com/chapter6-line-python-sdk/
-    flex_content = func.generate_carousel_content()
-    func.compile_message(event, flex_content)
+@app.route(f'{base_api}/webhook/stats', methods=['GET'])
+def webhook_stats():
+    return {
+        'dispatcher': dispatcher.stats(),
+        'batcher': batcher.stats(),
+        'line_client_pool': line_client_pool.stats(),
+        'scanner_shards': func.scanner_shard_metrics,
+        'render_cache': compiler.cache_stats(),
+        'snapshot_owner': shared_snapshot.store.is_owner if shared_snapshot.store else None,
+    }
+
+
+def dispatch_events(events):
+    # Route already verified events: message events are answered together from a
+    # single carousel render, follows and unfollows update the subscribers.
+    messages = []
+    for event in events:
+        if isinstance(event, MessageEvent) and isinstance(event.message, TextMessageContent):
+            messages.append(event)
+        elif isinstance(event, FollowEvent):
+            handle_follow(event)
+        elif isinstance(event, UnfollowEvent):
+            handle_unfollow(event)
+
+    if not messages:
+        return
+    if settings.WEBHOOK_BATCH_WINDOW:
+        batcher.add(messages)
+    else:
+        func.reply_to_events(messages)
+
+
+def handle_follow(event):
+    registry.add(event.source.user_id)
+
+
+def handle_unfollow(event):
+    registry.remove(event.source.user_id)
 
 
 if __name__ == "__main__":
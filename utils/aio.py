@@ -0,0 +1,164 @@
+"""
+Non-blocking counterparts of the webhook's outbound I/O, for the ASGI entry point.
+
+Replies go through the SDK's AsyncMessagingApi, so a single event loop keeps many
+webhook requests in flight without a thread each. The scanner is read through the
+snapshot layer of utils.functions (cache, shared snapshot, shards and retries), and
+that fetch, the extraction and the rendering run in the loop's default executor so
+they never block it.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+import aiohttp
+from linebot.v3.messaging import (
+    ApiException,
+    AsyncApiClient,
+    AsyncMessagingApi,
+    PushMessageRequest,
+    ReplyMessageRequest,
+)
+
+import config.settings as settings
+import utils.functions as func
+
+logger = logging.getLogger(__name__)
+
+line_api = None
+
+_bundle_lock = None
+
+
+async def start(configuration):
+    """
+    Open the async LINE client; call once the event loop runs.
+    """
+    global line_api, _bundle_lock
+
+    line_api = AsyncMessagingApi(AsyncApiClient(configuration))
+    _bundle_lock = asyncio.Lock()
+
+
+async def close():
+    global line_api
+
+    if line_api is not None:
+        await line_api.api_client.close()
+        line_api = None
+
+
+async def refresh_carousel_bundle():
+    """
+    Fetch and render the webhook carousel in a worker thread and publish it as the latest bundle.
+
+    Raises:
+        ScannerUnavailableError: If no market could be fetched; the previous bundle is kept.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, func.refresh_carousel_bundle)
+
+
+async def get_carousel_bundle(max_age=None):
+    """
+    Return the latest pre-rendered carousel bundle, shared with the synchronous app.
+
+    A missing or expired bundle is refreshed once, however many requests wait for it;
+    when the refresh fails the expired bundle is served rather than nothing.
+    """
+    bundle = func.fresh_carousel_bundle(max_age)
+    if bundle is not None:
+        return bundle
+
+    async with _bundle_lock:
+        bundle = func.fresh_carousel_bundle(max_age)
+        if bundle is None:
+            try:
+                bundle = await refresh_carousel_bundle()
+            except Exception as e:
+                bundle = func.fallback_carousel_bundle(e)
+        return bundle
+
+
+async def _send_raw_message(api, request_type, token, messages, timeout=None):
+    url, body, headers = func.raw_message_request(api.api_client, request_type, token, messages)
+    async with api.api_client.rest_client.pool_manager.post(
+            url, data=body, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        data = await response.read()
+
+    if response.status >= 400:
+        error = ApiException(status=response.status, reason=response.reason)
+        error.body = data
+        raise error
+
+    return json.loads(data or b'{}')
+
+
+async def send_message(api, request_type, token, messages, **kwargs):
+    """
+    Awaitable send_message for replies and pushes, with the same raw path for RawFlexMessage.
+    """
+    if any(isinstance(message, func.RawFlexMessage) for message in messages):
+        return await _send_raw_message(api, request_type, token, messages, timeout=kwargs.get('timeout'))
+
+    if request_type == 'reply':
+        return await api.reply_message(ReplyMessageRequest(reply_token=token, messages=messages, **kwargs))
+    elif request_type == 'push':
+        return await api.push_message(PushMessageRequest(to=token, messages=messages, **kwargs))
+    raise ValueError(f'Unsupported request type {request_type!r}; broadcasts go through the synchronous app.')
+
+
+async def deliver_messages(jobs, concurrency=None, preserve_order=None):
+    """
+    Awaitable deliver_messages: groups are sent concurrently, at most ``concurrency`` at once.
+
+    Returns:
+        DeliveryReport: Per-job results and errors and the total delivery latency.
+    """
+    if concurrency is None:
+        concurrency = settings.DELIVERY_CONCURRENCY
+    if preserve_order is None:
+        preserve_order = settings.DELIVERY_PRESERVE_ORDER
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def _send_group(group):
+        results = []
+        reply_failed = False
+        async with semaphore:
+            for index, request_type, token, messages in group:
+                started = time.monotonic()
+                response = error = None
+                if reply_failed:
+                    error = func.DeliveryAbortedError(
+                        f'Reply of the conversation failed, {request_type} #{index} skipped.')
+                    results.append(func.DeliveryResult(index, token, response, error, 0.0))
+                    continue
+                try:
+                    response = await send_message(line_api, request_type, token, messages, timeout=60)
+                except Exception as e:
+                    logger.error(f'Failed to {request_type} message #{index} to {token}: {e}')
+                    reply_failed = request_type == 'reply'
+                    error = e
+                results.append(func.DeliveryResult(index, token, response, error, time.monotonic() - started))
+        return results
+
+    started = time.monotonic()
+    groups = func.group_jobs(jobs, preserve_order)
+    grouped_results = await asyncio.gather(*(_send_group(group) for group in groups.values()))
+
+    results = sorted((result for group in grouped_results for result in group), key=lambda result: result.index)
+    report = func.DeliveryReport(results=results, elapsed=time.monotonic() - started)
+    logger.info(f'Delivered {len(results)} message(s) in {report.elapsed:.3f}s, {len(report.errors)} failed')
+    return report
+
+
+async def reply_to_events(events):
+    """
+    Awaitable reply_to_events: one bundle, delivered to every event's reply token.
+    """
+    bundle = await get_carousel_bundle()
+    jobs = await asyncio.get_running_loop().run_in_executor(None, func.event_jobs, events, bundle)
+    return await deliver_messages(jobs)
+
@@ -0,0 +1,166 @@
+"""
+Bounded in-process work queue used to acknowledge webhooks before handling them,
+and a micro-batcher coalescing the events of several webhooks.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class WebhookDispatcher:
+    """
+    Runs submitted jobs on a fixed pool of worker threads.
+
+    Jobs wait in a bounded queue; when it is full ``submit`` raises
+    ``QueueFullError`` instead of blocking the caller, so the web handler
+    can push back on LINE with a 503.
+    """
+
+    def __init__(self, workers, maxsize):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._workers = workers
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.metrics = {
+            'submitted': 0,
+            'processed': 0,
+            'failed': 0,
+            'rejected': 0,
+        }
+
+    def start(self):
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._run, name=f'webhook-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Enqueue ``fn(*args, **kwargs)`` for a worker.
+
+        Raises:
+            QueueFullError: If the queue is full or the dispatcher is shutting down.
+        """
+        # Checked and enqueued under one lock, so no job can land behind the stop sentinels.
+        with self._lock:
+            if self._closed:
+                raise QueueFullError('Dispatcher is shutting down.')
+            try:
+                self._queue.put_nowait((fn, args, kwargs))
+            except queue.Full:
+                self.metrics['rejected'] += 1
+                raise QueueFullError(f'Webhook queue is full ({self._queue.maxsize} jobs).')
+            self.metrics['submitted'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self.metrics, 'queued': self._queue.qsize(), 'workers': len(self._threads)}
+
+    def shutdown(self, timeout=None):
+        """
+        Stop accepting jobs, let workers drain everything already queued and wait for them,
+        at most ``timeout`` seconds in total.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        for _ in self._threads:
+            try:
+                self._queue.put(_STOP, timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                logger.warning(f'Webhook queue still full at the shutdown deadline, {self._queue.qsize()} jobs dropped.')
+                return
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+
+            fn, args, kwargs = job
+            try:
+                fn(*args, **kwargs)
+                self._count('processed')
+            except Exception:
+                logger.exception('Webhook job failed')
+                self._count('failed')
+
+    def _count(self, key):
+        with self._lock:
+            self.metrics[key] += 1
+
+
+class EventBatcher:
+    """
+    Collects webhook events for up to ``window`` seconds and hands them to ``flush``
+    in a single call, so events of requests arriving close together share one
+    fetch and render.
+
+    The window starts with the first event of a batch; ``flush`` runs on a timer thread.
+    """
+
+    def __init__(self, window, flush):
+        self.window = window
+        self._flush = flush
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+        self.metrics = {
+            'batches': 0,
+            'events': 0,
+            'largest': 0,
+            'failed': 0,
+        }
+
+    def add(self, events):
+        with self._lock:
+            self._pending.extend(events)
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """
+        Hand every pending event to ``flush`` now.
+        """
+        with self._lock:
+            events, self._pending = self._pending, []
+            timer, self._timer = self._timer, None
+            if events:
+                self.metrics['batches'] += 1
+                self.metrics['events'] += len(events)
+                self.metrics['largest'] = max(self.metrics['largest'], len(events))
+
+        if timer is not None and timer is not threading.current_thread():
+            timer.cancel()
+        if not events:
+            return
+
+        try:
+            self._flush(events)
+        except Exception:
+            logger.exception(f'Failed to handle a batch of {len(events)} webhook event(s)')
+            with self._lock:
+                self.metrics['failed'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self.metrics, 'pending': len(self._pending), 'window': self.window}
@@ -1,19 +1,36 @@
+import codecs
+import collections
 import functools
 import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from linebot.v3.messaging import (
-    ApiClient,
-    MessagingApi,
+    ApiException,
+    MulticastRequest,
     PushMessageRequest,
     ReplyMessageRequest,
     FlexMessage,
     FlexContainer, TextMessage,
 )
 
-import config.api as api
 import config.settings as settings
+import flex.compiler as compiler
 import flex.template as template
+import utils.markets as markets
+import utils.paging as paging
+import utils.vector as vector
+from utils.schema import SCHEMA, RSI, MACD
+from utils.line_pool import LineClientPool
+
+logger = logging.getLogger(__name__)
 
 
 def get_currency_pair_description(currency: str) -> tuple:
@@ -21,27 +38,25 @@ def get_currency_pair_description(currency: str) -> tuple:
     Generate currency pair name and its description.
 
     Parameters:
-        currency (str): Currency symbol string from data entry (e.g., "EURUSD").
+        currency (str): Symbol string from data entry (e.g., "FX_IDC:EURUSD" or "BINANCE:BTCUSDT"),
+                        looked up in the precomputed symbol table of utils.markets.
 
     Returns:
-        tuple: A tuple containing the currency name and its description.
+        tuple: A tuple containing the name, its description and the base and quote currencies.
     """
 
-    name = currency.replace(settings.PREFIX, '')
-    base_currency, quote_currency = name[:3], name[3:]
-    description = f'{settings.CURRENCY[base_currency]} vs {settings.CURRENCY[quote_currency]}'
-
-    return name, description, base_currency, quote_currency
+    return markets.describe(currency)
 
 
-def get_signal(indicator: list) -> str:
+def get_signal(indicator: list, schema=SCHEMA) -> str:
     """
     Determine the trend of financial data based on positive or negative indicators.
 
     Parameters:
     - indicator (list): A list of numerical indicators where positive values represent positive signals
                         and negative values represent negative signals. The function specifically
-                        focuses on the indicators in the index range [8:16].
+                        focuses on the MACD columns of every timeframe.
+    - schema (ColumnSchema): Column layout of the indicator list.
 
     Returns:
     - str: 'UPTREND' if there are more positive indicators,
@@ -50,7 +65,7 @@ def get_signal(indicator: list) -> str:
     """
 
     # Filter relevant indicators.
-    relevant_indicators = indicator[8:16]
+    relevant_indicators = [indicator[offset] for offset in schema.offsets(MACD)]
 
     # Count positive and negative indicators.
     positive_count = sum(1 for num in relevant_indicators if num > 0)
@@ -65,20 +80,21 @@ def get_signal(indicator: list) -> str:
         return 'NEURAL'
 
 
-def get_status(indicator: list) -> list:
+def get_status(indicator: list, schema=SCHEMA) -> list:
     """
     Analyzes the provided indicator values and returns a list of states where
     the value is either overbought or oversold based on defined settings.
 
     Args:
     - indicator (list): List of indicator values.
+    - schema (ColumnSchema): Column layout of the indicator list.
 
     Returns:
-    - list: A list of dictionaries containing 'value' and 'timeframe'.
+    - list: A list of dictionaries containing the float 'value' and 'timeframe'.
     """
 
     states = []
-    indicator = indicator[:8]
+    indicator = [indicator[offset] for offset in schema.offsets(RSI)]
 
     # Iterate over the indicator values and their corresponding intervals simultaneously.
     for value, interval in zip(indicator, settings.INTERVAL):
@@ -86,98 +102,268 @@ def get_status(indicator: list) -> list:
         # Check if the value is either overbought or oversold.
         if value >= settings.OVERBOUGHT or value <= settings.OVERSOLD:
             states.append({
-                'value': '%.2f' % value,
+                'value': value,
                 'timeframe': interval
             })
 
     return states
 
 
-def extract_fibo(indicator: list, tf: str) -> dict:
+def extract_fibo(indicator: list, tf: str, schema=SCHEMA) -> dict:
     """
     Extracts Fibonacci values based on the given timeframe (tf).
 
     Parameters:
     - indicator (list): List containing the indicator values.
     - tf (str): Timeframe, e.g., 'M1', 'M5', etc.
+    - schema (ColumnSchema): Column layout of the indicator list.
 
     Returns:
-    - dict: A dictionary containing the Fibonacci values.
+    - dict: A dictionary containing the Fibonacci values as floats, from R3 down to S3.
             If the given timeframe is not valid, an empty dictionary is returned.
     """
 
-    # A mapping of timeframes to their respective index ranges in the indicator list
-    INTERVAL_RANGE = settings.INDICATOR_INTERVAL_RANGE
-
-    if tf not in INTERVAL_RANGE:
+    if tf not in settings.INTERVAL_RESOLUTION:
         return {}
 
-    start, end = INTERVAL_RANGE[tf]
-    scope = indicator[start:end]
-
     fib = {
-        'R3': f'{scope[0]:.5f}',
-        'R2': f'{scope[1]:.5f}',
-        'R1': f'{scope[2]:.5f}',
-        'S1': f'{scope[3]:.5f}',
-        'S2': f'{scope[4]:.5f}',
-        'S3': f'{scope[5]:.5f}'
+        level: indicator[offset]
+        for level, offset in schema.fibo_offsets(tf).items()
     }
     return fib
 
 
-def extract_forex_info(data: dict) -> dict:
+class ForexSignal(collections.namedtuple('ForexSignal', [
+    'symbol', 'base_currency', 'quote_currency', 'value', 'timeframe', 'signal', 'description',
+    'R3', 'R2', 'R1', 'S1', 'S2', 'S3',
+])):
+    """
+    One overbought/oversold timeframe of a symbol.
+
+    ``value`` (the RSI) and the Fibonacci levels stay floats; they are only
+    formatted when the bubble is rendered (see get_payload_for_bubble).
+    """
+
+    __slots__ = ()
+
+
+def extract_forex_info(data: dict, schema=SCHEMA) -> dict:
     """
     Extract Forex information from given data.
 
     Parameters:
         data (dict): Raw data containing Forex information.
+        schema (ColumnSchema): Column layout the data was fetched with.
 
     Returns:
-        dict: A dictionary containing extracted Forex information or an error message.
+        dict: ForexSignal records keyed by "<symbol>_<timeframe>", or an error message.
     """
 
     forex_entries = data.get('data', [])
     if not forex_entries:
         return {'error': 'Data not found!'}
 
+    if settings.VECTORIZED_ENGINE:
+        return _extract_forex_info_vectorized(forex_entries, schema)
+
     forex_info = {}
 
     for entry in forex_entries:
-        currency = entry.get('s')
-        indicator = entry.get('d')
+        forex_info.update(_extract_entry(entry, schema))
 
-        if not currency:
-            continue
+    return forex_info
 
-        name, desc, base_currency, quote_currency = get_currency_pair_description(currency)
-        status = get_status(indicator)
 
-        if not status:
-            continue
+def _extract_entry(entry: dict, schema=SCHEMA):
+    """
+    Yield the (key, record) pairs of every overbought or oversold timeframe of one scanner entry.
+    """
+    currency = entry.get('s')
+    indicator = entry.get('d')
+
+    if not currency:
+        return
+
+    if len(indicator) != len(schema):
+        raise ValueError(f'Scanner row of {currency} does not match the {len(schema)} columns of the schema.')
+
+    status = get_status(indicator, schema)
+
+    if not status:
+        return
+
+    name, desc, base_currency, quote_currency = get_currency_pair_description(currency)
+    signal = get_signal(indicator, schema)
+
+    for info in status:
+        timeframe = info["timeframe"]
+        yield f'{name}_{timeframe}', ForexSignal(
+            name, base_currency, quote_currency, info['value'], timeframe, signal, desc,
+            *extract_fibo(indicator, timeframe, schema).values()
+        )
+
+
+def stream_forex_info(rows, schema=SCHEMA):
+    """
+    Streaming counterpart of extract_forex_info.
+
+    Rows without an overbought/oversold state are dropped as soon as they are
+    decoded; only the extracted records of the current row are held in memory.
+
+    Parameters:
+        rows (iterable): Scanner ``data`` entries, e.g. from iter_scanner_rows.
+        schema (ColumnSchema): Column layout the rows were fetched with.
+
+    Yields:
+        tuple: (key, ForexSignal) pairs in response order.
+    """
+    for entry in rows:
+        yield from _extract_entry(entry, schema)
+
+
+_DATA_ARRAY_RE = re.compile(r'"data"\s*:\s*\[')
+_SEPARATORS_RE = re.compile(r'[\s,]*')
+
+
+def iter_scanner_rows(chunks):
+    """
+    Incrementally decode the ``data`` entries of a scanner response.
 
-        for info in status:
-            timeframe = info["timeframe"]
-            key = f'{name}_{timeframe}'
-            forex_info[key] = {
-                'symbol': name,
-                'base_currency': base_currency,
-                'quote_currency': quote_currency,
-                'value': info['value'],
-                'timeframe': info['timeframe'],
-                'signal': get_signal(indicator),
-                'description': desc,
-                **extract_fibo(indicator, timeframe)
-            }
+    Parameters:
+        chunks (iterable): Raw response body chunks (bytes), as they arrive from the socket.
+
+    Yields:
+        dict: One ``{"s": ..., "d": [...]}`` entry at a time; the buffer never holds
+              more than the entry being decoded plus one chunk.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    in_array = False
+
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+
+        if not in_array:
+            match = _DATA_ARRAY_RE.search(buffer)
+            if not match:
+                continue
+            buffer = buffer[match.end():]
+            in_array = True
+
+        while True:
+            position = _SEPARATORS_RE.match(buffer).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                entry, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The entry is still incomplete, wait for the next chunk.
+                buffer = buffer[position:]
+                break
+            buffer = buffer[end:]
+            yield entry
+
+
+class _JitteredRetry(Retry):
+    """
+    Retry policy whose exponential backoff is spread with random jitter so
+    workers retrying at the same moment don't hit the upstream in lockstep.
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, backoff) if backoff else backoff
+
+
+def _build_http_session():
+    retry = _JitteredRetry(
+        total=settings.HTTP_RETRIES,
+        backoff_factor=settings.HTTP_BACKOFF_FACTOR,
+        status_forcelist=settings.HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_SIZE,
+        pool_maxsize=settings.HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    return session
+
+
+# Shared by every outbound call so keep-alive connections are reused.
+http_session = _build_http_session()
+
+HTTP_TIMEOUT = (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+
+# Headers of every TradingView scanner request.
+SCANNER_HEADERS = {
+    'Content-Type': 'application/json',
+    'Authorization': f'Basic {settings.TOKEN}'
+}
+
+
+class ScannerUnavailableError(Exception):
+    """Raised when the scanner data of no market at all could be fetched."""
+
+
+def _extract_forex_info_vectorized(forex_entries: list, schema=SCHEMA) -> dict:
+    """
+    Same records as extract_forex_info, computed over the whole response at once.
+    """
+    forex_entries = [entry for entry in forex_entries if entry.get('s')]
+    matrix = vector.load_matrix([entry.get('d') for entry in forex_entries], schema)
+
+    signals = vector.get_signals(matrix, schema)
+    fibo = vector.get_fibo(matrix, schema)
+    rows, intervals = vector.get_states(matrix, schema)
+
+    # Gather everything the records need in one pass, as plain Python values.
+    values = matrix[:, schema.offsets(RSI)][rows, intervals].tolist()
+    levels = fibo[rows, intervals].tolist()
+    row_signals = signals[rows].tolist()
+
+    forex_info = {}
+    descriptions = {}
+
+    for row, interval, value, level, signal in zip(rows.tolist(), intervals.tolist(), values, levels, row_signals):
+        if row not in descriptions:
+            descriptions[row] = get_currency_pair_description(forex_entries[row]['s'])
+        name, desc, base_currency, quote_currency = descriptions[row]
+        timeframe = settings.INTERVAL[interval]
+
+        forex_info[f'{name}_{timeframe}'] = ForexSignal(
+            name, base_currency, quote_currency, value, timeframe, signal, desc, *level
+        )
 
     return forex_info
 
 
+def stream_scanner_data(schema=SCHEMA, market='forex'):
+    """
+    Fetch the scanner response and yield its ``data`` entries while they are still downloading.
+
+    Bypasses the snapshot cache, which needs the whole response.
+    """
+    market = markets.get(market)
+    with http_session.post(market.endpoint, headers=SCANNER_HEADERS, data=market.request_payload(schema),
+                           timeout=HTTP_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        yield from iter_scanner_rows(response.iter_content(chunk_size=settings.SCANNER_STREAM_CHUNK_SIZE))
+
+
 def post_data_to_tradingview(url: str, header: dict, payload: json):
     """
     Post the provided payload to the TradingView API and return the response data.
     """
-    response = requests.post(url, headers=header, data=payload)
+    response = http_session.post(url, headers=header, data=payload, timeout=HTTP_TIMEOUT)
 
     # Check for any errors in the API call
     response.raise_for_status()
@@ -189,99 +375,406 @@ def generate_carousel_content():
     """
     Generates carousel content based on the information fetched.
 
-    This function retrieves information and then breaks it down
-    into chunks of maximum allowed items (as defined in settings).
-    Each chunk of information is then processed to get a carousel string
-    and appended to a list of all carousels.
+    This function retrieves information, renders a bubble per signal
+    and pages the bubbles into carousels of the maximum allowed items
+    and size (as defined in settings).
 
     Returns:
         list: A list of JSON-formatted carousel strings.
     """
 
-    # Fetch the information
-    info = get_info()
+    if settings.SCANNER_STREAMING:
+        # Render each page as soon as enough rows have been decoded from the socket.
+        records = (
+            record
+            for market in markets.enabled()
+            for _, record in stream_forex_info(stream_scanner_data(market=market.name))
+        )
+    else:
+        # Fetch the information of every market
+        return generate_carousels_from_data(data for _, data in fetch_market_data())
+
+    # Page the bubbles into carousels as they are rendered
+    return generate_carousels(records)
+
+
+def generate_carousels_from_data(responses) -> list:
+    """
+    Extracts the signals of raw scanner responses and renders them into carousels.
+
+    Args:
+        responses (iterable): Raw scanner responses, one per market.
+
+    Returns:
+        list: JSON-formatted carousel strings.
+    """
+    info = {}
+    for data in responses:
+        if data.get('data'):
+            info.update(extract_forex_info(data))
+    return generate_carousels(info.values())
+
+
+CarouselBundle = collections.namedtuple('CarouselBundle', ['version', 'created_at', 'messages'])
+
+_carousel_bundle = None
+_carousel_bundle_lock = threading.Lock()
+# Held while a bundle is rendered on demand, so concurrent callers wait for one render.
+_carousel_refresh_lock = threading.Lock()
+
+
+def refresh_carousel_bundle():
+    """
+    Fetch and render the webhook carousel and publish it as the latest bundle.
+
+    Returns:
+        CarouselBundle: The freshly rendered bundle.
 
-    # Chunk the information based on the maximum allowed items
-    chunks = _chunk_info(info)
+    Raises:
+        ScannerUnavailableError: If no market could be fetched; the previous bundle is kept.
+    """
+    return publish_carousel_bundle(build_flex_messages(generate_carousel_content()))
+
+
+def publish_carousel_bundle(messages):
+    """
+    Publish already built messages as the latest carousel bundle.
 
-    # Process each chunk to generate carousel content
-    all_carousels = [
-        _generate_carousel_from_chunk(chunk)
-        for chunk in chunks
-    ]
+    Returns:
+        CarouselBundle: The published bundle.
+    """
+    global _carousel_bundle
 
-    return all_carousels
+    with _carousel_bundle_lock:
+        version = _carousel_bundle.version + 1 if _carousel_bundle else 1
+        _carousel_bundle = CarouselBundle(version=version, created_at=time.time(), messages=messages)
+        return _carousel_bundle
 
 
-def _chunk_info(info):
+def get_carousel_bundle(max_age=None):
     """
-    Splits the information into chunks of a specific size.
+    Return the latest pre-rendered carousel bundle.
+
+    A missing bundle, or one older than ``max_age`` seconds, is refreshed in place,
+    once however many threads ask for it at the same time. When the refresh fails
+    the expired bundle is served rather than nothing.
 
     Args:
-        info (dict): The dictionary containing information to be chunked.
+        max_age (int, optional): Maximum accepted bundle age, defaults to settings.CAROUSEL_BUNDLE_MAX_AGE.
 
     Returns:
-        list: A list of dictionaries where each dictionary is a chunk of the original info.
+        CarouselBundle: The bundle to reply with.
+    """
+    bundle = fresh_carousel_bundle(max_age)
+    if bundle is not None:
+        return bundle
+
+    with _carousel_refresh_lock:
+        bundle = fresh_carousel_bundle(max_age)
+        if bundle is None:
+            try:
+                bundle = refresh_carousel_bundle()
+            except Exception as e:
+                bundle = fallback_carousel_bundle(e)
+        return bundle
+
+
+def fresh_carousel_bundle(max_age=None):
+    """
+    Return the latest carousel bundle if it is at most ``max_age`` seconds old
+    (settings.CAROUSEL_BUNDLE_MAX_AGE by default), otherwise None.
+    """
+    if max_age is None:
+        max_age = settings.CAROUSEL_BUNDLE_MAX_AGE
+
+    bundle = _carousel_bundle
+    if bundle is not None and time.time() - bundle.created_at <= max_age:
+        return bundle
+    return None
+
+
+def fallback_carousel_bundle(error):
+    """
+    Return the bundle to serve after a refresh failed with ``error``: the expired one.
+
+    Raises:
+        Exception: ``error`` itself when no bundle was ever published.
     """
-    return [
-        dict(list(info.items())[i:i + settings.MAXIMUM_ITEMS])
-        for i in range(0, len(info), settings.MAXIMUM_ITEMS)
-    ]
+    bundle = _carousel_bundle
+    if bundle is None:
+        raise error
+    logger.warning(f'Carousel refresh failed, serving bundle v{bundle.version}: {error}')
+    return bundle
 
 
-def _generate_carousel_from_chunk(chunk):
+def generate_carousels(records) -> list:
     """
-    Generates a JSON-formatted carousel string for a given chunk of information.
+    Renders ForexSignal records into carousel JSON strings.
+
+    The records are consumed once; pages respect both settings.MAXIMUM_ITEMS and
+    LINE's byte limits (see utils.paging).
 
     Args:
-        chunk (dict): A chunk of information.
+        records (iterable): ForexSignal records, in display order.
 
     Returns:
-        str: JSON-formatted carousel string.
-    """
-    carousel = {
-        "type": "carousel",
-        "contents": [
-            get_payload_for_bubble(instance, template.generate_bubble_string)
-            for _, instance in chunk.items()
-        ]
-    }
-    return json.dumps(carousel)
+        list: JSON-formatted carousel strings.
+    """
+    return list(paging.carousels(_render_bubble(record) for record in records))
+
+
+def _render_bubble(instance):
+    if settings.FLEX_PRECOMPILED:
+        return get_payload_for_bubble(instance, compiler.render_bubble)
+    return json.dumps(get_payload_for_bubble(instance, template.generate_bubble_string))
 
 
 def get_payload_for_bubble(instance, func):
     payload = {
-        'symbol': instance['symbol'],
-        'desc': instance['description'],
-        'signal': instance['signal'],
-        'value': instance['value'],
-        'timeframe': instance['timeframe'],
-        'R3': instance['R3'],
-        'R2': instance['R2'],
-        'R1': instance['R1'],
-        'S1': instance['S1'],
-        'S2': instance['S2'],
-        'S3': instance['S3'],
+        'symbol': instance.symbol,
+        'desc': instance.description,
+        'signal': instance.signal,
+        'value': '%.2f' % instance.value,
+        'timeframe': instance.timeframe,
+        'R3': f'{instance.R3:.5f}',
+        'R2': f'{instance.R2:.5f}',
+        'R1': f'{instance.R1:.5f}',
+        'S1': f'{instance.S1:.5f}',
+        'S2': f'{instance.S2:.5f}',
+        'S3': f'{instance.S3:.5f}',
     }
     return func(payload)
 
 
-def get_info(is_task=False):
-    payload = settings.BASE_PAYLOAD
-    json_payload = json.dumps(payload, indent=4)
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Basic {settings.TOKEN}'
-    }
-    res = post_data_to_tradingview(url=api.TRADINGVIEW, header=headers, payload=json_payload)
+class SnapshotCache:
+    """
+    Process-wide TTL cache for a single upstream snapshot.
+
+    A fresh snapshot is served as is. A stale one (older than ``ttl`` but within
+    ``ttl + stale_ttl``) is still served while one background thread refreshes it.
+    On a miss, concurrent callers coalesce into a single call of ``loader``
+    and all of them receive its result (or its exception).
+    """
+
+    def __init__(self, loader, ttl, stale_ttl=0):
+        self._loader = loader
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._fetched_at = 0.0
+        self._inflight = None
+
+    def get(self):
+        """
+        Return the cached snapshot, loading it from upstream if needed.
+        """
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if self._value is not None and age < self._ttl:
+                return self._value
+
+            if self._value is not None and age < self._ttl + self._stale_ttl:
+                if self._inflight is None:
+                    self._inflight = _Flight()
+                    threading.Thread(target=self._load, args=(self._inflight,), daemon=True).start()
+                return self._value
+
+            leader = self._inflight is None
+            if leader:
+                self._inflight = _Flight()
+            flight = self._inflight
+
+        if leader:
+            self._load(flight)
+
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def invalidate(self):
+        """
+        Drop the cached snapshot so the next call goes upstream.
+        """
+        with self._lock:
+            self._value = None
+            self._fetched_at = 0.0
+
+    def _load(self, flight):
+        try:
+            flight.value = self._loader()
+        except Exception as exc:
+            logger.warning(f'Snapshot refresh failed: {exc}')
+            flight.error = exc
+        finally:
+            with self._lock:
+                if flight.error is None:
+                    self._value = flight.value
+                    self._fetched_at = time.monotonic()
+                self._inflight = None
+            flight.done.set()
+
+
+class _Flight:
+    """
+    A single in-flight upstream load shared by every waiting caller.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def fetch_scanner_data(schema=SCHEMA, market='forex'):
+    """
+    Fetch the raw scanner response of a market from TradingView.
+
+    Only the columns of ``schema`` are requested, so callers needing a few indicators
+    can pass a narrower schema (e.g. ``RSI_SCHEMA``) for a smaller, faster response;
+    the rows must then be parsed with that same schema. Large ticker lists are fetched in shards when settings.SCANNER_SHARD_SIZE is set.
+    """
+    market = markets.get(market)
+    if settings.SCANNER_SHARD_SIZE and len(market.tickers) > settings.SCANNER_SHARD_SIZE:
+        return _fetch_sharded(schema, market, settings.SCANNER_SHARD_SIZE)
+
+    return post_data_to_tradingview(url=market.endpoint, header=SCANNER_HEADERS, payload=market.request_payload(schema))
+
+
+# Per-shard outcome of the latest sharded fetch of each market.
+scanner_shard_metrics = {}
+
+
+def _fetch_sharded(schema, market, size):
+    """
+    Fetch the market's tickers in shards of ``size`` concurrently and merge the rows in ticker order.
+
+    A failed shard is logged and skipped; the fetch only fails when every shard does.
+    """
+    if schema is market.schema:
+        shards = market.shard_payloads(size)
+    else:
+        shards = [(shard, market.request_payload(schema, shard)) for shard, _ in market.shard_payloads(size)]
+
+    def _fetch(shard):
+        tickers, payload = shard
+        started = time.monotonic()
+        try:
+            data = post_data_to_tradingview(url=market.endpoint, header=SCANNER_HEADERS, payload=payload)
+            return data.get('data') or [], None, time.monotonic() - started
+        except Exception as e:
+            return [], e, time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=min(settings.SCANNER_SHARD_CONCURRENCY, len(shards))) as executor:
+        results = list(executor.map(_fetch, shards))
+
+    metrics, rows, errors = [], [], []
+    for index, ((shard, _), (data, error, elapsed)) in enumerate(zip(shards, results)):
+        metrics.append({
+            'shard': index,
+            'tickers': len(shard),
+            'rows': len(data),
+            'elapsed': elapsed,
+            'error': repr(error) if error else None,
+        })
+        if error is not None:
+            logger.warning(f'{market.name} scanner shard {index} ({len(shard)} tickers) failed: {error}')
+            errors.append(error)
+        rows.extend(data)
+
+    scanner_shard_metrics[market.name] = metrics
+    if len(errors) == len(shards):
+        raise errors[-1]
+
+    return {'totalCount': len(rows), 'data': rows}
+
+
+# One snapshot per market, shared by the webhook path and the scheduled tasks.
+scanner_snapshots = {
+    name: SnapshotCache(
+        functools.partial(fetch_scanner_data, market=name),
+        ttl=settings.SNAPSHOT_TTL,
+        stale_ttl=settings.SNAPSHOT_STALE_TTL,
+    )
+    for name in markets.MARKETS
+}
+# Snapshots of narrower schemas, keyed by (market, columns) and created on first use.
+_schema_snapshots = {}
+_schema_snapshots_lock = threading.Lock()
+
+
+def get_scanner_snapshot(market='forex', schema=SCHEMA):
+    """
+    The SnapshotCache of ``market`` holding responses with the columns of ``schema``.
+    """
+    if schema is SCHEMA:
+        return scanner_snapshots[market]
+
+    key = (market, schema.columns)
+    with _schema_snapshots_lock:
+        if key not in _schema_snapshots:
+            _schema_snapshots[key] = SnapshotCache(
+                functools.partial(fetch_scanner_data, schema=schema, market=market),
+                ttl=settings.SNAPSHOT_TTL,
+                stale_ttl=settings.SNAPSHOT_STALE_TTL,
+            )
+        return _schema_snapshots[key]
+
+
+def get_info(is_task=False, market='forex', schema=SCHEMA):
+    res = get_scanner_snapshot(market, schema).get()
 
     if is_task:
         return res
 
-    data = extract_forex_info(res)
+    data = extract_forex_info(res, schema)
     return data
 
 
+def iter_market_data(names=None, schema=SCHEMA):
+    """
+    Fetch the scanner snapshots of several markets concurrently.
+
+    Args:
+        names (list, optional): Market names, defaults to settings.MARKETS.
+        schema (ColumnSchema, optional): Columns to fetch, the full SCHEMA by default.
+
+    Yields:
+        tuple: (market name, raw scanner response) as soon as each market's fetch completes,
+               so a slow market doesn't hold back the others. Failed markets are logged and skipped.
+    """
+    names = names or settings.MARKETS
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {executor.submit(get_info, True, name, schema): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                yield name, future.result()
+            except Exception as e:
+                logger.error(f'Failed to fetch {name} scanner data: {e}')
+
+
+def fetch_market_data(names=None) -> list:
+    """
+    Fetch the scanner snapshots of several markets concurrently, in their configured order.
+
+    Args:
+        names (list, optional): Market names, defaults to settings.MARKETS.
+
+    Returns:
+        list: (market name, raw scanner response) of every market that could be fetched.
+
+    Raises:
+        ScannerUnavailableError: If no market could be fetched.
+    """
+    names = names or settings.MARKETS
+    results = dict(iter_market_data(names))
+    if not results:
+        raise ScannerUnavailableError(f'No scanner data could be fetched for {", ".join(names)}.')
+    return [(name, results[name]) for name in names if name in results]
+
+
 def rgetattr(obj, attr, *args):
     def _getattr(obj, attr):
         return getattr(obj, attr, *args)
@@ -289,20 +782,191 @@ def rgetattr(obj, attr, *args):
     return functools.reduce(_getattr, [obj] + attr.split('.'))
 
 
+class RawFlexMessage(collections.namedtuple('RawFlexMessage', ['alt_text', 'contents'])):
+    """
+    A Flex message whose ``contents`` is an already rendered container JSON string.
+
+    It is spliced into the request body as is, so it never goes through a
+    FlexContainer parse/validate/serialize round trip.
+    """
+
+    def to_json(self) -> str:
+        return f'{{"type":"flex","altText":{json.dumps(self.alt_text)},"contents":{self.contents}}}'
+
+
+def build_flex_message(items, alt_text="Overtrade Signal"):
+    """
+    Wrap one rendered carousel into a message ready to be sent.
+
+    Args:
+    - items: A FlexMessage or RawFlexMessage (kept as is), a FlexContainer, a carousel dict,
+             or a JSON-formatted carousel string.
+    - alt_text (str): Text shown in notifications.
+
+    Returns:
+    - FlexMessage or RawFlexMessage: RawFlexMessage for strings when settings.FLEX_RAW_DELIVERY is set.
+    """
+    if isinstance(items, (FlexMessage, RawFlexMessage)):
+        return items
+    if isinstance(items, FlexContainer):
+        return FlexMessage(alt_text=alt_text, contents=items)
+    if isinstance(items, dict):
+        return FlexMessage(alt_text=alt_text, contents=FlexContainer.from_dict(items))
+    if settings.FLEX_RAW_DELIVERY:
+        return RawFlexMessage(alt_text=alt_text, contents=items)
+    return FlexMessage(alt_text=alt_text, contents=FlexContainer.from_json(items))
+
+
+def build_flex_messages(content):
+    """
+    Wrap rendered carousels into messages ready to be sent.
+
+    Args:
+    - content: Carousels in any form accepted by build_flex_message.
+
+    Returns:
+    - list: A list of FlexMessage or RawFlexMessage objects.
+    """
+    return [build_flex_message(items) for items in content]
+
+
+def _message_size(message) -> int:
+    """
+    Size in bytes of what LINE checks against its per-message limit (a flex message's contents).
+    """
+    if isinstance(message, RawFlexMessage):
+        return paging.json_size(message.contents)
+    if isinstance(message, FlexMessage):
+        return paging.json_size(message.contents.to_json())
+    return 0
+
+
+def pack_messages(messages, max_messages=None, max_bytes=None) -> list:
+    """
+    Group messages into as few API calls as possible, keeping their order.
+
+    Args:
+    - messages (list): Messages to send to one recipient.
+    - max_messages (int, optional): Messages per call, defaults to settings.MESSAGES_PER_REQUEST.
+    - max_bytes (int, optional): Per-message limit, defaults to settings.FLEX_CAROUSEL_MAX_BYTES.
+
+    Returns:
+    - list: The messages list of every call. A message over ``max_bytes`` is sent in a call
+            of its own, so LINE rejecting it doesn't take the other messages down with it.
+    """
+    max_messages = max_messages or settings.MESSAGES_PER_REQUEST
+    max_bytes = max_bytes or settings.FLEX_CAROUSEL_MAX_BYTES
+
+    calls = []
+    batch = []
+    for message in messages:
+        size = _message_size(message)
+        if size > max_bytes:
+            logger.warning(f'Message of {size} bytes is over the {max_bytes} bytes limit, sending it alone.')
+            calls.append([message])
+            continue
+
+        batch.append(message)
+        if len(batch) == max_messages:
+            calls.append(batch)
+            batch = []
+
+    if batch:
+        calls.append(batch)
+    return calls
+
+
+def _send_raw_message(api, request_type, token, messages, timeout=None):
+    """
+    Post a message request whose body is assembled from pre-rendered JSON strings.
+
+    SDK message objects mixed in are serialized the way the SDK would.
+    """
+    url, body, headers = raw_message_request(api.api_client, request_type, token, messages)
+    response = api.api_client.rest_client.pool_manager.request('POST', url, body=body, headers=headers,
+                                                               timeout=timeout)
+
+    if response.status >= 400:
+        error = ApiException(status=response.status, reason=response.reason)
+        error.body = response.data
+        raise error
+
+    return json.loads(response.data or b'{}')
+
+
+def raw_message_request(api_client, request_type, token, messages):
+    """
+    The (url, body, headers) of a message request sent through _send_raw_message.
+    """
+    configuration = api_client.configuration
+
+    rendered = ','.join(
+        message.to_json() if isinstance(message, RawFlexMessage)
+        else json.dumps(api_client.sanitize_for_serialization(message))
+        for message in messages
+    )
+    recipient = '"replyToken"' if request_type == 'reply' else '"to"'
+    body = f'{{{recipient}:{json.dumps(token)},"messages":[{rendered}]}}'.encode()
+
+    headers = {
+        **api_client.default_headers,
+        'Authorization': f'Bearer {configuration.access_token}',
+        'Content-Type': 'application/json',
+    }
+    return f'{configuration.host}/v2/bot/message/{request_type}', body, headers
+
+
+line_client_pool = None
+
+
+def configure_line_client(configuration):
+    """
+    Create the LINE client pool shared by every reply and push.
+
+    Args:
+    - configuration: The linebot Configuration holding the channel access token.
+
+    Returns:
+    - LineClientPool: The pool used by compile_message.
+    """
+    global line_client_pool
+
+    if line_client_pool is not None:
+        line_client_pool.close()
+
+    line_client_pool = LineClientPool(
+        configuration,
+        size=settings.LINE_CLIENT_POOL_SIZE,
+        max_idle=settings.LINE_CLIENT_MAX_IDLE,
+        max_lifetime=settings.LINE_CLIENT_MAX_LIFETIME,
+    )
+    return line_client_pool
+
+
+def get_line_client_pool():
+    if line_client_pool is None:
+        from main import configuration  # fix circular import
+        configure_line_client(configuration)
+    return line_client_pool
+
+
 def send_message(api, request_type, token, messages, **kwargs):
     """
     Sends a message using the specified request type.
 
     Args:
     - api: The LINE bot API instance.
-    - request_type: Either 'reply' or 'push'.
-    - token: Token for the communication (reply_token or user_id).
+    - request_type: Either 'reply', 'push' or 'multicast'.
+    - token: Token for the communication (reply_token, user_id or a list of user_ids).
     - messages: The messages to be sent.
     - **kwargs: Additional arguments for the request.
 
     Returns:
     - Response from the API call.
     """
+    if any(isinstance(message, RawFlexMessage) for message in messages):
+        return _send_raw_message(api, request_type, token, messages, timeout=kwargs.get('timeout'))
+
     if request_type == 'reply':
         return api.reply_message(
             ReplyMessageRequest(
@@ -319,6 +983,183 @@ def send_message(api, request_type, token, messages, **kwargs):
                 **kwargs
             )
         )
+    elif request_type == 'multicast':
+        return api.multicast(
+            MulticastRequest(
+                to=token,
+                messages=messages,
+                **kwargs
+            )
+        )
+
+
+class RateLimiter:
+    """
+    Token bucket allowing ``rate`` calls per second with bursts of up to ``rate`` calls.
+    """
+
+    def __init__(self, rate):
+        self._rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._rate, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+DeliveryResult = collections.namedtuple('DeliveryResult', ['index', 'token', 'response', 'error', 'elapsed'])
+
+
+class DeliveryAbortedError(Exception):
+    """Recorded for the jobs of a conversation that were not sent because its reply failed."""
+
+
+class DeliveryReport(collections.namedtuple('DeliveryReport', ['results', 'elapsed'])):
+    """
+    Outcome of a deliver_messages call: one DeliveryResult per job, in job order,
+    and the wall-clock time of the whole delivery.
+    """
+
+    @property
+    def errors(self):
+        return [result for result in self.results if result.error is not None]
+
+
+def deliver_messages(jobs, concurrency=None, preserve_order=None, rate_limiter=None):
+    """
+    Send a batch of LINE API calls concurrently.
+
+    Jobs addressed to the same token are sent one after another when ``preserve_order``
+    is set (replies always are, since a reply token is bound to a single conversation);
+    otherwise every job is an independent unit of work. Jobs sharing a conversation key
+    are always sent in order, and once a reply of the conversation fails the rest of it
+    is skipped. At most ``concurrency`` calls run at once, each on its own pooled client.
+
+    Args:
+    - jobs (list): (request_type, token, messages) tuples, optionally followed by a
+                   conversation key grouping jobs of different tokens.
+    - concurrency (int, optional): Defaults to settings.DELIVERY_CONCURRENCY.
+    - preserve_order (bool, optional): Defaults to settings.DELIVERY_PRESERVE_ORDER.
+    - rate_limiter (RateLimiter, optional): Acquired before every API call.
+
+    Returns:
+    - DeliveryReport: Per-job results and errors and the total delivery latency.
+    """
+    if concurrency is None:
+        concurrency = settings.DELIVERY_CONCURRENCY
+    if preserve_order is None:
+        preserve_order = settings.DELIVERY_PRESERVE_ORDER
+
+    groups = group_jobs(jobs, preserve_order)
+
+    def _send_group(group):
+        results = []
+        reply_failed = False
+        pool = get_line_client_pool()
+        with pool.acquire() as line_bot_api:
+            for index, request_type, token, messages in group:
+                started = time.monotonic()
+                response = error = None
+                if reply_failed:
+                    error = DeliveryAbortedError(f'Reply of the conversation failed, {request_type} #{index} skipped.')
+                    results.append(DeliveryResult(index, token, response, error, 0.0))
+                    continue
+                try:
+                    if rate_limiter is not None:
+                        rate_limiter.acquire()
+                    response = send_message(line_bot_api, request_type, token, messages, timeout=60)
+                except Exception as e:
+                    logger.error(f'Failed to {request_type} message #{index} to {token}: {e}')
+                    pool.report_error(line_bot_api, e)
+                    reply_failed = request_type == 'reply'
+                    error = e
+                results.append(DeliveryResult(index, token, response, error, time.monotonic() - started))
+        return results
+
+    started = time.monotonic()
+    workers = min(concurrency, len(groups))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            grouped_results = list(executor.map(_send_group, groups.values()))
+    else:
+        grouped_results = [_send_group(group) for group in groups.values()]
+
+    results = sorted((result for group in grouped_results for result in group), key=lambda result: result.index)
+    report = DeliveryReport(results=results, elapsed=time.monotonic() - started)
+    logger.info(f'Delivered {len(results)} message(s) in {report.elapsed:.3f}s, {len(report.errors)} failed')
+    return report
+
+
+def group_jobs(jobs, preserve_order):
+    """
+    Group delivery jobs into units sent one after another, keyed by their conversation
+    or, when their order matters, by recipient. Each job becomes (index, request_type, token, messages).
+    """
+    groups = collections.OrderedDict()
+    for index, (request_type, token, messages, *conversation) in enumerate(jobs):
+        recipient = tuple(token) if isinstance(token, list) else token
+        if conversation:
+            key = ('conversation', conversation[0])
+        elif preserve_order or request_type == 'reply':
+            key = (request_type, recipient)
+        else:
+            key = index
+        groups.setdefault(key, []).append((index, request_type, token, messages))
+    return groups
+
+
+BroadcastReport = collections.namedtuple(
+    'BroadcastReport', ['recipients', 'batches', 'delivery', 'throughput']
+)
+
+_multicast_rate_limiter = RateLimiter(settings.MULTICAST_RATE_LIMIT)
+
+
+def broadcast_message(recipients, content):
+    """
+    Deliver carousels to many users through LINE multicast.
+
+    Recipients are split into batches of settings.MULTICAST_MAX_RECIPIENTS. Batches run
+    concurrently under a shared rate limiter, while the carousels within one batch keep
+    their order.
+
+    Args:
+    - recipients (list): LINE user ids.
+    - content (list): Carousels in any form accepted by build_flex_message.
+
+    Returns:
+    - BroadcastReport: Recipient and batch counts, the delivery report and recipients/s.
+    """
+    recipients = list(dict.fromkeys(recipients))
+    size = settings.MULTICAST_MAX_RECIPIENTS
+    batches = [recipients[i:i + size] for i in range(0, len(recipients), size)]
+    messages = build_flex_messages(content)
+
+    jobs = [('multicast', batch, call) for batch in batches for call in pack_messages(messages)]
+    delivery = deliver_messages(
+        jobs,
+        concurrency=settings.MULTICAST_CONCURRENCY,
+        preserve_order=True,
+        rate_limiter=_multicast_rate_limiter,
+    )
+
+    failed = {tuple(result.token) for result in delivery.errors}
+    delivered = sum(len(batch) for batch in batches if tuple(batch) not in failed)
+    throughput = delivered / delivery.elapsed if delivery.elapsed else 0.0
+    logger.info(f'Broadcast to {delivered}/{len(recipients)} recipients in {len(batches)} batch(es), '
+                f'{throughput:.1f} recipients/s')
+
+    return BroadcastReport(recipients=len(recipients), batches=len(batches), delivery=delivery, throughput=throughput)
 
 
 def compile_message(event=None, content=None, **kwargs):
@@ -327,29 +1168,67 @@ def compile_message(event=None, content=None, **kwargs):
 
     Args:
     - event (Event, optional): Event object containing details of the LINE event.
-    - content (str, optional): The content/message to be sent.
+    - content (list, optional): Carousel strings, dicts, FlexContainers or pre-built messages to be sent.
     - **kwargs: Additional keyword arguments.
 
     Returns:
-    - None
+    - DeliveryReport: The delivery outcome, or None when the default reply was sent.
     """
-    from main import configuration  # fix circular import
     is_task = kwargs.get('is_task', False)
 
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-
-        # No content case: Reply with a default message if not a task.
-        if not content and not is_task:
+    # No content case: Reply with a default message if not a task.
+    if not content and not is_task:
+        with get_line_client_pool().acquire() as line_bot_api:
             send_message(line_bot_api, 'reply', getattr(event, 'reply_token', event),
                          [TextMessage(text='No interesting currency pairs found.')])
-            return
+        return
+
+    return deliver_messages(compile_jobs(event, content, is_task))
+
 
-        # Determine the request type and token based on the content and is_task flag.
-        request_type = 'push' if len(content) <= settings.MAXIMUM_ITEMS or is_task else 'reply'
-        token = rgetattr(event, 'source.user_id', event) if request_type == 'push' else getattr(event, 'reply_token',
-                                                                                                event)
+def reply_to_events(events):
+    """
+    Answer several message events with one carousel bundle.
+
+    The carousels are fetched and rendered once, then delivered to every event's
+    reply token in a single concurrent delivery.
+
+    Args:
+    - events (list): Message events, e.g. every one of a webhook body.
+
+    Returns:
+    - DeliveryReport: The delivery outcome of all events.
+    """
+    return deliver_messages(event_jobs(events, get_carousel_bundle()))
+
+
+def event_jobs(events, bundle):
+    """
+    The delivery jobs answering every one of ``events`` with ``bundle``.
+    """
+    jobs = []
+    for event in events:
+        if bundle.messages:
+            jobs.extend(compile_jobs(event, bundle.messages, False))
+        else:
+            jobs.append(('reply', event.reply_token, [TextMessage(text='No interesting currency pairs found.')]))
+    return jobs
+
+
+def compile_jobs(event, content, is_task):
+    """
+    The (request_type, token, messages) delivery jobs of compile_message, with the
+    messages packed into as few calls as possible. An event's reply and the pushes of
+    its overflow share the user as conversation key, so they are sent in order.
+    """
+    user_id = rgetattr(event, 'source.user_id', event)
+    calls = pack_messages(build_flex_messages(content))
+
+    # Scheduled tasks have no reply token and can only push.
+    if is_task:
+        return [('push', user_id, call) for call in calls]
 
-        for items in content:
-            message = FlexMessage(alt_text="Overtrade Signal", contents=FlexContainer.from_json(items))
-            send_message(line_bot_api, request_type, token, [message], timeout=60)
+    # Replies are free of the push quota but a reply token can only be used once;
+    # whatever doesn't fit in the reply is pushed.
+    reply_token = getattr(event, 'reply_token', event)
+    return [('reply', reply_token, calls[0], user_id)] + [('push', user_id, call, user_id) for call in calls[1:]]
@@ -0,0 +1,167 @@
+"""
+Long-lived, thread-safe pool of LINE MessagingApi clients.
+"""
+
+import contextlib
+import logging
+import threading
+import time
+
+import urllib3
+from linebot.v3.messaging import (
+    ApiClient,
+    ApiException,
+    MessagingApi,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_transport_error(exc) -> bool:
+    """
+    Whether ``exc`` means the client's connection is broken rather than the request rejected.
+
+    The SDK reports transport and SSL failures as an ApiException with status 0.
+    """
+    if isinstance(exc, urllib3.exceptions.HTTPError):
+        return True
+    return isinstance(exc, ApiException) and not exc.status
+
+
+class _PooledClient:
+    def __init__(self, configuration):
+        self.api_client = ApiClient(configuration)
+        self.api = MessagingApi(self.api_client)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.broken = False
+
+    def is_healthy(self, max_idle, max_lifetime):
+        now = time.monotonic()
+        return not self.broken and now - self.last_used < max_idle and now - self.created_at < max_lifetime
+
+    def connection_stats(self):
+        """Return (connections opened, requests sent) across the client's urllib3 pools."""
+        opened = requests = 0
+        pools = self.api_client.rest_client.pool_manager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            opened += pool.num_connections
+            requests += pool.num_requests
+        return opened, requests
+
+    def close(self):
+        try:
+            self.api_client.close()
+            self.api_client.rest_client.pool_manager.clear()
+        except Exception as e:
+            logger.debug(f'Failed to close LINE client: {e}')
+
+
+class LineClientPool:
+    """
+    Keeps up to ``size`` MessagingApi clients alive so their keep-alive
+    connections (and TLS sessions) survive across replies and pushes.
+
+    Clients idle for longer than ``max_idle`` seconds, older than ``max_lifetime``
+    seconds, or that raised a transport error are closed and replaced.
+    """
+
+    def __init__(self, configuration, size, max_idle=240, max_lifetime=3600):
+        self._configuration = configuration
+        self._max_idle = max_idle
+        self._max_lifetime = max_lifetime
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._busy = {}
+        self._closed_opened = 0
+        self._closed_requests = 0
+        self.metrics = {
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+        }
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """
+        Borrow a MessagingApi instance, blocking while all clients are in use.
+        """
+        with self._slots:
+            client = self._checkout()
+            healthy = True
+            try:
+                yield client.api
+            except Exception as e:
+                healthy = not is_transport_error(e)
+                raise
+            finally:
+                self._checkin(client, healthy and not client.broken)
+
+    def report_error(self, api, exc):
+        """
+        Tell the pool a call on the borrowed ``api`` failed, for callers that handle
+        the exception inside ``acquire``. A transport error retires the client on check-in.
+        """
+        if is_transport_error(exc):
+            with self._lock:
+                client = self._busy.get(id(api))
+            if client is not None:
+                client.broken = True
+
+    def stats(self):
+        """
+        Return pool counters together with urllib3 connection reuse figures
+        of every live client, idle or checked out.
+        """
+        with self._lock:
+            opened, requests = self._closed_opened, self._closed_requests
+            for client in [*self._idle, *self._busy.values()]:
+                client_opened, client_requests = client.connection_stats()
+                opened += client_opened
+                requests += client_requests
+            return {
+                **self.metrics,
+                'idle': len(self._idle),
+                'in_use': len(self._busy),
+                'connections_opened': opened,
+                'requests_sent': requests,
+                'connections_reused': max(requests - opened, 0),
+            }
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                client = self._idle.pop()
+                if client.is_healthy(self._max_idle, self._max_lifetime):
+                    self.metrics['reused'] += 1
+                    self._busy[id(client.api)] = client
+                    return client
+                self._discard(client)
+            self.metrics['created'] += 1
+        client = _PooledClient(self._configuration)
+        with self._lock:
+            self._busy[id(client.api)] = client
+        return client
+
+    def _checkin(self, client, healthy):
+        client.last_used = time.monotonic()
+        with self._lock:
+            self._busy.pop(id(client.api), None)
+            if healthy:
+                self._idle.append(client)
+            else:
+                self._discard(client)
+
+    def _discard(self, client):
+        opened, requests = client.connection_stats()
+        self._closed_opened += opened
+        self._closed_requests += requests
+        self.metrics['discarded'] += 1
+        client.close()
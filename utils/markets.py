@@ -0,0 +1,160 @@
+"""
+Registry of the TradingView markets the pipeline can scan.
+
+Each market has its own scanner endpoint, a request payload compiled once into
+bytes, and its own way of turning a raw ticker (``"FX_IDC:EURUSD"``) into a
+name, description and base/quote pair. The descriptions of every configured
+ticker are precomputed into a symbol table at import time.
+"""
+
+import sys
+
+import config.api as api
+import config.settings as settings
+from utils.schema import SCHEMA
+
+
+class Market:
+    def __init__(self, name, endpoint, prefix, tickers, types, describe, schema=SCHEMA):
+        self.name = name
+        self.endpoint = endpoint
+        self.prefix = prefix
+        self.tickers = [f'{prefix}{ticker}' for ticker in tickers]
+        self.schema = schema
+        self.base_payload = {
+            'symbols': {
+                'tickers': self.tickers,
+                'query': {
+                    'types': types
+                }
+            },
+        }
+        self.payload = schema.payload(base=self.base_payload).encode()
+        self._describe = describe
+        self._shards = {}
+
+    def __repr__(self):
+        return f'<Market {self.name}>'
+
+    def request_payload(self, schema=None, tickers=None) -> bytes:
+        """
+        Scanner request body; the precompiled one unless a narrower schema or ticker subset is asked for.
+        """
+        if (schema is None or schema is self.schema) and tickers is None:
+            return self.payload
+        return (schema or self.schema).payload(base=self.base_payload, tickers=tickers).encode()
+
+    def shard_payloads(self, size) -> list:
+        """
+        (tickers, payload bytes) of every shard of ``size`` tickers, compiled on first use.
+        """
+        if size not in self._shards:
+            shards = [self.tickers[i:i + size] for i in range(0, len(self.tickers), size)]
+            self._shards[size] = [(shard, self.request_payload(tickers=shard)) for shard in shards]
+        return self._shards[size]
+
+    def describe(self, ticker: str) -> tuple:
+        """
+        Return (name, description, base, quote) of a raw scanner ticker.
+        """
+        return self._describe(ticker.replace(self.prefix, ''))
+
+
+def _describe_forex(name):
+    base_currency, quote_currency = name[:3], name[3:]
+    description = (
+        f'{settings.CURRENCY.get(base_currency, base_currency)} vs '
+        f'{settings.CURRENCY.get(quote_currency, quote_currency)}'
+    )
+    return name, description, base_currency, quote_currency
+
+
+def _describe_crypto(name):
+    quote = next((quote for quote in settings.CRYPTO_QUOTES if name.endswith(quote) and name != quote), '')
+    base = name[:len(name) - len(quote)]
+    description = f'{settings.CRYPTO.get(base, base)} vs {settings.CRYPTO.get(quote, quote)}' if quote else name
+    return name, description, base, quote
+
+
+def _describe_stock(name):
+    return name, settings.STOCKS.get(name, name), name, 'USD'
+
+
+MARKETS = {
+    market.name: market
+    for market in (
+        Market('forex', api.TRADINGVIEW, settings.PREFIX, settings.FOREX_GROUP, ['forex'], _describe_forex),
+        Market('crypto', api.TRADINGVIEW_CRYPTO, settings.CRYPTO_PREFIX, settings.CRYPTO_GROUP, ['crypto'],
+               _describe_crypto),
+        Market('stock', api.TRADINGVIEW_AMERICA, settings.STOCK_PREFIX, settings.STOCK_GROUP, ['stock'],
+               _describe_stock),
+    )
+}
+
+
+def get(name: str) -> Market:
+    return MARKETS[name]
+
+
+def enabled() -> list:
+    """
+    The markets listed in settings.MARKETS, in that order.
+    """
+    return [MARKETS[name] for name in settings.MARKETS]
+
+
+def for_ticker(ticker: str) -> Market:
+    """
+    The market a raw scanner ticker belongs to, by its exchange prefix (forex when unknown).
+    """
+    for market in MARKETS.values():
+        if ticker.startswith(market.prefix):
+            return market
+    return MARKETS['forex']
+
+
+class SymbolMeta:
+    """
+    Precomputed, interned metadata of one raw scanner ticker.
+    """
+
+    __slots__ = ('ticker', 'market', 'name', 'description', 'base', 'quote', 'info')
+
+    def __init__(self, ticker, market):
+        name, description, base, quote = (sys.intern(value) for value in market.describe(ticker))
+        self.ticker = sys.intern(ticker)
+        self.market = market.name
+        self.name = name
+        self.description = description
+        self.base = base
+        self.quote = quote
+        # The (name, description, base, quote) tuple returned by get_currency_pair_description.
+        self.info = (name, description, base, quote)
+
+    def __repr__(self):
+        return f'<SymbolMeta {self.ticker}>'
+
+
+# Raw ticker -> SymbolMeta for every ticker of every registered market.
+SYMBOLS = {
+    ticker: SymbolMeta(ticker, market)
+    for market in MARKETS.values()
+    for ticker in market.tickers
+}
+
+
+def lookup(ticker: str) -> SymbolMeta:
+    """
+    O(1) metadata of a raw scanner ticker.
+
+    Tickers outside the configured universe are described by their market on first
+    sight (unknown currency codes fall back to the code itself) and memoized.
+    """
+    meta = SYMBOLS.get(ticker)
+    if meta is None:
+        meta = SYMBOLS[ticker] = SymbolMeta(ticker, for_ticker(ticker))
+    return meta
+
+
+def describe(ticker: str) -> tuple:
+    return lookup(ticker).info
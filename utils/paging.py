@@ -0,0 +1,76 @@
+"""
+Lazy pagination of rendered Flex bubbles into carousels.
+
+A LINE carousel holds at most settings.MAXIMUM_ITEMS bubbles and its JSON may not
+exceed settings.FLEX_CAROUSEL_MAX_BYTES. Pages are built in a single pass over the
+bubbles, so a generator of rendered bubbles is paged as it is produced.
+"""
+
+import logging
+
+import config.settings as settings
+import flex.compiler as compiler
+
+logger = logging.getLogger(__name__)
+
+# Bytes the carousel wrapper of compiler.render_carousel adds around its bubbles.
+CAROUSEL_OVERHEAD = len(compiler.render_carousel([]))
+
+
+def json_size(text: str) -> int:
+    """
+    UTF-8 size of a JSON string; the precompiled templates only emit ASCII.
+    """
+    return len(text) if text.isascii() else len(text.encode())
+
+
+def paginate(bubbles, max_items=None, max_bytes=None, max_bubble_bytes=None):
+    """
+    Group rendered bubble JSON strings into carousel pages.
+
+    A page is closed when it holds ``max_items`` bubbles or when the next bubble
+    would push the carousel JSON over ``max_bytes``. A bubble larger than
+    ``max_bubble_bytes`` on its own would get the whole message rejected by LINE,
+    so it is logged and dropped.
+
+    Args:
+        bubbles (iterable): Bubble JSON strings, e.g. from compiler.render_bubble.
+        max_items (int, optional): Defaults to settings.MAXIMUM_ITEMS.
+        max_bytes (int, optional): Defaults to settings.FLEX_CAROUSEL_MAX_BYTES.
+        max_bubble_bytes (int, optional): Defaults to settings.FLEX_BUBBLE_MAX_BYTES.
+
+    Yields:
+        list: The bubble JSON strings of one carousel.
+    """
+    max_items = max_items or settings.MAXIMUM_ITEMS
+    max_bytes = max_bytes or settings.FLEX_CAROUSEL_MAX_BYTES
+    max_bubble_bytes = min(max_bubble_bytes or settings.FLEX_BUBBLE_MAX_BYTES, max_bytes - CAROUSEL_OVERHEAD)
+
+    page = []
+    page_bytes = CAROUSEL_OVERHEAD
+
+    for bubble in bubbles:
+        size = json_size(bubble)
+        if size > max_bubble_bytes:
+            logger.warning(f'Dropping a {size} bytes bubble, over the {max_bubble_bytes} bytes limit.')
+            continue
+
+        # Every bubble after the first is preceded by a comma.
+        added = size + 1 if page else size
+        if page and (len(page) == max_items or page_bytes + added > max_bytes):
+            yield page
+            page, page_bytes, added = [], CAROUSEL_OVERHEAD, size
+
+        page.append(bubble)
+        page_bytes += added
+
+    if page:
+        yield page
+
+
+def carousels(bubbles, **limits):
+    """
+    Render the pages of ``paginate(bubbles, **limits)`` as carousel JSON strings.
+    """
+    for page in paginate(bubbles, **limits):
+        yield compiler.render_carousel(page)
@@ -0,0 +1,84 @@
+"""
+In-process cache of Firestore configuration documents.
+"""
+
+import logging
+import threading
+import time
+
+from firebase_admin import firestore
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentCache:
+    """
+    Keeps a copy of one Firestore document in memory.
+
+    The first read registers a snapshot listener, after which updates are pushed by
+    Firestore and reads make no network calls. Until the listener has delivered a
+    snapshot, or if it stops, the document is polled at most once per ``ttl`` seconds.
+
+    ``client_factory`` returns the Firestore client (``firestore.client`` by default);
+    anything exposing ``collection(name).document(name)`` with ``get()`` and
+    ``on_snapshot(callback)`` works, e.g. an emulator client or an in-memory fake.
+    """
+
+    def __init__(self, collection, document, ttl=300, client_factory=None):
+        self.collection = collection
+        self.document = document
+        self.ttl = ttl
+        self._client_factory = client_factory or firestore.client
+        self._lock = threading.Lock()
+        self._doc_ref = None
+        self._watch = None
+        self._data = {}
+        self._loaded_at = None
+        self._from_listener = False
+
+    def get(self, key, default=None):
+        self._ensure_fresh()
+        return self._data.get(key, default)
+
+    def to_dict(self) -> dict:
+        self._ensure_fresh()
+        return dict(self._data)
+
+    def stop(self):
+        with self._lock:
+            if self._watch is not None:
+                self._watch.unsubscribe()
+                self._watch = None
+            self._from_listener = False
+
+    def _ensure_fresh(self):
+        if self._from_listener and self._listening():
+            return
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+
+        with self._lock:
+            try:
+                if self._doc_ref is None:
+                    self._doc_ref = self._client_factory().collection(self.collection).document(self.document)
+                if not self._listening():
+                    self._from_listener = False
+                    self._watch = self._doc_ref.on_snapshot(self._on_snapshot)
+                if not self._from_listener:
+                    self._store(self._doc_ref.get().to_dict())
+            except Exception as e:
+                # Keep serving the last known document (or the callers' defaults).
+                logger.warning(f'Could not refresh {self.collection}/{self.document}: {e}')
+                self._loaded_at = time.monotonic()
+
+    def _listening(self):
+        return self._watch is not None and getattr(self._watch, 'is_active', True)
+
+    def _on_snapshot(self, snapshots, changes, read_time):
+        if snapshots:
+            self._store(snapshots[-1].to_dict())
+            self._from_listener = True
+
+    def _store(self, data):
+        self._data = data or {}
+        self._loaded_at = time.monotonic()
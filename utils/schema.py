@@ -0,0 +1,97 @@
+"""
+Column schema of the TradingView scanner payload.
+
+Scanner rows are plain lists ordered like the requested ``columns``. This module
+compiles the column names once (``"RSI|15"`` -> indicator ``RSI``, timeframe ``M15``)
+so parsing code looks offsets up by name instead of relying on hard-coded slices.
+"""
+
+import json
+
+import config.settings as settings
+
+RSI = 'RSI'
+MACD = 'MACD.macd'
+FIBO_LEVELS = ('R3', 'R2', 'R1', 'S1', 'S2', 'S3')
+FIBO = tuple(f'Pivot.M.Fibonacci.{level}' for level in FIBO_LEVELS)
+
+# Indicators every timeframe in settings.INTERVAL must provide.
+REQUIRED_INDICATORS = (RSI, MACD) + FIBO
+
+
+class ColumnSchema:
+    """
+    Maps (indicator, timeframe) pairs to their offset in a scanner row.
+    """
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self._offsets = {}
+        self._timeframes = {resolution: timeframe for timeframe, resolution in settings.INTERVAL_RESOLUTION.items()}
+
+        for offset, column in enumerate(self.columns):
+            indicator, _, resolution = column.partition('|')
+            timeframe = self._timeframes.get(resolution)
+            if timeframe is None:
+                raise ValueError(f'Unknown resolution in scanner column {column!r}.')
+            self._offsets[(indicator, timeframe)] = offset
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __contains__(self, key):
+        return key in self._offsets
+
+    def offset(self, indicator: str, timeframe: str) -> int:
+        return self._offsets[(indicator, timeframe)]
+
+    def offsets(self, indicator: str, timeframes=None) -> list:
+        """
+        Offsets of ``indicator`` for each timeframe, in settings.INTERVAL order by default.
+        """
+        return [self._offsets[(indicator, timeframe)] for timeframe in timeframes or settings.INTERVAL]
+
+    def fibo_offsets(self, timeframe: str) -> dict:
+        """
+        Offsets of the Fibonacci pivot levels of ``timeframe``, keyed by level name.
+        """
+        return {level: self._offsets[(column, timeframe)] for level, column in zip(FIBO_LEVELS, FIBO)}
+
+    def select(self, indicators) -> 'ColumnSchema':
+        """
+        Build a narrower schema holding only the columns of ``indicators``, in the current order.
+        """
+        wanted = set(indicators)
+        return ColumnSchema(column for column in self.columns if column.partition('|')[0] in wanted)
+
+    def validate(self, indicators=REQUIRED_INDICATORS, timeframes=None):
+        """
+        Raise ValueError if any ``indicators`` x ``timeframes`` column is missing.
+        """
+        missing = [
+            f'{indicator}@{timeframe}'
+            for indicator in indicators
+            for timeframe in timeframes or settings.INTERVAL
+            if (indicator, timeframe) not in self._offsets
+        ]
+        if missing:
+            raise ValueError(f'Scanner payload is missing columns: {", ".join(missing)}')
+
+    def payload(self, base=None, tickers=None) -> str:
+        """
+        JSON scanner request body asking only for this schema's columns,
+        optionally restricted to ``tickers``.
+        """
+        base = base or settings.BASE_PAYLOAD
+        payload = {**base, 'columns': list(self.columns)}
+        if tickers is not None:
+            payload['symbols'] = {**base['symbols'], 'tickers': list(tickers)}
+        return json.dumps(payload)
+
+
+SCHEMA = ColumnSchema(settings.BASE_PAYLOAD['columns'])
+SCHEMA.validate()
+
+# The RSI columns only, all the alert task reads: a quarter of the full payload.
+RSI_SCHEMA = SCHEMA.select([RSI])
+RSI_SCHEMA.validate(indicators=(RSI,))
@@ -0,0 +1,288 @@
+"""
+Scanner snapshots shared by the worker processes of one host through a memory-mapped file.
+
+One process, the owner, elected with an exclusive lock on ``<path>.lock``, fetches from
+TradingView and publishes every market's response as a compact binary snapshot. The
+other workers map the same file and read it without any upstream call or JSON parsing.
+Reads are not zero-copy: the matrix is decoded in place, but every read rebuilds the
+response rows as Python lists, since that is the shape the extractors take.
+
+Layout (little endian)::
+
+    header   magic b'OTSS', format u16, padding u16, sequence u64, body length u64
+    body     market count u32, padding u32, then per market:
+             name length u16, padding u16, rows u32, columns u32, tickers length u32,
+             published_at f64, name, tickers ('\\n' joined), padding to 8 bytes,
+             rows x columns float64 matrix (NaN for missing values)
+
+The header's sequence is a seqlock: the owner makes it odd before writing the body and
+even again afterwards; readers retry while it is odd or when it changed during their read,
+for up to a timeout. A sequence left odd for good means the owner died mid-publish.
+
+``configure`` plugs a SharedSnapshot into the scanner snapshot caches of utils.functions
+and handles the ownership: publishing, reading, waiting and taking over.
+"""
+
+import fcntl
+import functools
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+import config.settings as settings
+import utils.functions as func
+import utils.markets as markets
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'OTSS'
+FORMAT = 1
+
+HEADER = struct.Struct('<4sHHQQ')
+BODY = struct.Struct('<II')
+SECTION = struct.Struct('<HHIIId')
+
+_SEQUENCE_OFFSET = 8
+
+# What decoding a torn or corrupt body can raise.
+DECODE_ERRORS = (ValueError, OverflowError, IndexError, struct.error, UnicodeDecodeError)
+
+
+class SnapshotBusyError(Exception):
+    """Raised when a consistent snapshot could not be read within the timeout."""
+
+
+class SharedSnapshot:
+    """
+    A memory-mapped file holding the latest scanner response of every market.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.is_owner = False
+        self._lock_fd = None
+        self._owner_lock = threading.Lock()
+        self._latest = {}
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def acquire(self) -> bool:
+        """
+        Try to become the owner, without blocking.
+
+        Returns:
+            bool: True only for the call that made this process the owner.
+        """
+        with self._owner_lock:
+            if self.is_owner:
+                return False
+
+            fd = os.open(f'{self.path}.lock', os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+
+            # Held until the process exits, when the kernel releases it for another worker.
+            self._lock_fd = fd
+            self.is_owner = True
+            return True
+
+    def publish(self, market: str, data: dict):
+        """
+        Write ``data``, a raw scanner response, as the snapshot of ``market``. Owner only.
+        """
+        rows = [entry for entry in data.get('data') or [] if entry.get('s')]
+        columns = len(rows[0]['d']) if rows else 0
+        matrix = np.array([entry['d'] for entry in rows], dtype='<f8').reshape(len(rows), columns)
+        tickers = '\n'.join(entry['s'] for entry in rows)
+
+        with self._owner_lock:
+            self._latest[market] = (time.time(), tickers, matrix)
+            body = self._encode(self._latest)
+            if HEADER.size + len(body) > self.size:
+                raise ValueError(f'Snapshot of {len(body)} bytes does not fit in {self.path} ({self.size} bytes).')
+
+            sequence = HEADER.unpack_from(self._map)[3] if self._map[:4] == MAGIC else 0
+            sequence += 1 if sequence % 2 == 0 else 2
+            HEADER.pack_into(self._map, 0, MAGIC, FORMAT, 0, sequence, len(body))
+            self._map[HEADER.size:HEADER.size + len(body)] = body
+            HEADER.pack_into(self._map, 0, MAGIC, FORMAT, 0, sequence + 1, len(body))
+
+    def read(self, market: str, timeout=0.05):
+        """
+        Read the snapshot of ``market``.
+
+        Returns:
+            tuple: (published_at, raw scanner response) or None if the market was never published.
+
+        Raises:
+            SnapshotBusyError: If no consistent snapshot could be read within ``timeout`` seconds,
+                because the owner kept rewriting it or died while writing it.
+        """
+        deadline = time.monotonic() + timeout
+        view = memoryview(self._map)
+        try:
+            while True:
+                magic, fmt, _, sequence, length = HEADER.unpack_from(view)
+                if magic != MAGIC or fmt != FORMAT:
+                    return None
+
+                if sequence % 2 == 0:
+                    try:
+                        result = self._decode(view[HEADER.size:HEADER.size + length], market)
+                    except DECODE_ERRORS:
+                        # A torn read can decode garbage; only an unchanged sequence makes it an error.
+                        if struct.unpack_from('<Q', view, _SEQUENCE_OFFSET)[0] == sequence:
+                            raise
+                    else:
+                        if struct.unpack_from('<Q', view, _SEQUENCE_OFFSET)[0] == sequence:
+                            return result
+
+                if time.monotonic() >= deadline:
+                    raise SnapshotBusyError(f'Could not read a consistent {market} snapshot from {self.path}.')
+                time.sleep(0)
+        finally:
+            view.release()
+
+    def close(self):
+        self._map.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @staticmethod
+    def _encode(latest) -> bytes:
+        parts = [BODY.pack(len(latest), 0)]
+        for market, (published_at, tickers, matrix) in latest.items():
+            name = market.encode()
+            text = tickers.encode()
+            rows, columns = matrix.shape
+            parts.append(SECTION.pack(len(name), 0, rows, columns, len(text), published_at))
+            parts.append(name)
+            parts.append(text)
+            parts.append(b'\0' * (-(SECTION.size + len(name) + len(text)) % 8))
+            parts.append(matrix.tobytes())
+        return b''.join(parts)
+
+    @staticmethod
+    def _decode(body, market):
+        count, _ = BODY.unpack_from(body)
+        offset = BODY.size
+        wanted = market.encode()
+
+        for _ in range(count):
+            name_length, _, rows, columns, text_length, published_at = SECTION.unpack_from(body, offset)
+            start = offset + SECTION.size
+            name = bytes(body[start:start + name_length])
+            text_start = start + name_length
+            matrix_start = text_start + text_length + (-(SECTION.size + name_length + text_length) % 8)
+            offset = matrix_start + rows * columns * 8
+
+            if name != wanted:
+                continue
+
+            # The matrix is a view on the mapping; tolist() copies it into the response rows.
+            matrix = np.frombuffer(body, dtype='<f8', count=rows * columns, offset=matrix_start)
+            tickers = bytes(body[text_start:text_start + text_length]).decode().split('\n') if rows else []
+            entries = [{'s': ticker, 'd': values} for ticker, values in
+                       zip(tickers, matrix.reshape(rows, columns).tolist())]
+            return published_at, {'totalCount': rows, 'data': entries}
+
+        return None
+
+
+# The snapshot file of this process, once configure() was called.
+store = None
+_on_takeover = None
+# Last snapshot a non-owner read per market, served while the shared one is unreadable.
+_last_read = {}
+
+
+def configure(snapshot, on_takeover=None):
+    """
+    Serve the scanner snapshots through a SharedSnapshot shared by several processes.
+
+    The owner process keeps fetching from TradingView and publishes every response;
+    other processes read what the owner published. When the owner's snapshots go
+    stale or unreadable (the process died, possibly mid-publish), the first reader
+    to notice takes ownership over and ``on_takeover`` is called, e.g. to start the
+    scheduler. Until then readers serve the last snapshot they read.
+
+    Args:
+    - snapshot (SharedSnapshot): The memory-mapped snapshot file.
+    - on_takeover (callable, optional): Called once if this process becomes the owner later on.
+    """
+    global store, _on_takeover
+
+    store = snapshot
+    _on_takeover = on_takeover
+
+    for name in markets.MARKETS:
+        if snapshot.is_owner:
+            func.scanner_snapshots[name] = func.SnapshotCache(
+                functools.partial(_fetch_and_publish, name),
+                ttl=settings.SNAPSHOT_TTL,
+                stale_ttl=settings.SNAPSHOT_STALE_TTL,
+            )
+        else:
+            func.scanner_snapshots[name] = func.SnapshotCache(
+                functools.partial(_read_published, name),
+                ttl=settings.SHARED_SNAPSHOT_POLL,
+            )
+
+
+def _fetch_and_publish(market):
+    data = func.fetch_scanner_data(market=market)
+    try:
+        store.publish(market, data)
+    except Exception as e:
+        logger.error(f'Failed to publish the {market} snapshot: {e}')
+    return data
+
+
+def _read_published(market):
+    max_age = settings.SNAPSHOT_TTL + settings.SNAPSHOT_STALE_TTL
+    deadline = time.monotonic() + settings.SHARED_SNAPSHOT_WAIT
+
+    while True:
+        try:
+            snapshot = store.read(market)
+        except (SnapshotBusyError, *DECODE_ERRORS) as e:
+            # Busy for too long, or a corrupt body under a stable sequence: unreadable either way.
+            logger.warning(f'Unreadable {market} snapshot in {store.path}: {e!r}')
+            snapshot = None
+
+        if snapshot is not None and time.time() - snapshot[0] <= max_age:
+            break
+
+        if store.acquire():
+            logger.warning(f'No fresh {market} snapshot was published, this process takes over fetching.')
+            configure(store, _on_takeover)
+            if _on_takeover is not None:
+                _on_takeover()
+            return func.scanner_snapshots[market].get()
+
+        snapshot = snapshot or _last_read.get(market)
+        if snapshot is not None:
+            break
+        if time.monotonic() >= deadline:
+            raise LookupError(f'No {market} snapshot was published within {settings.SHARED_SNAPSHOT_WAIT}s.')
+        # The owner publishes as soon as it starts; wait for it rather than serve nothing.
+        time.sleep(0.1)
+
+    _last_read[market] = snapshot
+    return snapshot[1]
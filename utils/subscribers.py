@@ -0,0 +1,84 @@
+"""
+Registry of LINE users who receive trade alerts.
+"""
+
+import logging
+import threading
+import time
+
+from firebase_admin import firestore
+
+import config.settings as settings
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = 'subscribers'
+
+# Seconds before retrying a failed load, doubled after every failure up to the maximum.
+LOAD_RETRY_BACKOFF = 5
+LOAD_RETRY_BACKOFF_MAX = 300
+
+
+class SubscriberRegistry:
+    """
+    In-memory set of subscribed user ids backed by the Firestore ``subscribers`` collection.
+
+    The collection is read once, on first access; follows and unfollows are written
+    through. When Firestore is unavailable the registry keeps working from memory,
+    seeded with ``settings.SUBSCRIBERS``, and retries the load with an exponential backoff.
+    """
+
+    def __init__(self, seed=()):
+        self._lock = threading.Lock()
+        self._users = dict.fromkeys(seed)
+        self._loaded = False
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def all(self) -> list:
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._users)
+
+    def add(self, user_id: str):
+        self._ensure_loaded()
+        with self._lock:
+            self._users[user_id] = None
+        self._write(lambda collection: collection.document(user_id).set({'user_id': user_id}))
+
+    def remove(self, user_id: str):
+        self._ensure_loaded()
+        with self._lock:
+            self._users.pop(user_id, None)
+        self._write(lambda collection: collection.document(user_id).delete())
+
+    def __len__(self):
+        return len(self.all())
+
+    def _ensure_loaded(self):
+        if self._loaded or time.monotonic() < self._retry_at:
+            return
+        try:
+            documents = firestore.client().collection(COLLECTION).stream()
+            user_ids = [document.id for document in documents]
+        except Exception as e:
+            with self._lock:
+                backoff = min(LOAD_RETRY_BACKOFF * 2 ** self._failures, LOAD_RETRY_BACKOFF_MAX)
+                self._failures += 1
+                self._retry_at = time.monotonic() + backoff
+            logger.warning(f'Could not load subscribers from Firestore, retrying in {backoff}s: {e}')
+            return
+        with self._lock:
+            self._users.update(dict.fromkeys(user_ids))
+            self._loaded = True
+            self._failures = 0
+
+    @staticmethod
+    def _write(operation):
+        try:
+            operation(firestore.client().collection(COLLECTION))
+        except Exception as e:
+            logger.warning(f'Could not persist subscriber change: {e}')
+
+
+registry = SubscriberRegistry(seed=settings.SUBSCRIBERS)
@@ -1,68 +1,220 @@
 import json
-
-import requests
-from firebase_admin import firestore
+import logging
+import os
+import time
 
 import config.api as api
 import config.settings as settings
+import flex.compiler as compiler
 import flex.template as template
 import utils.functions as func
+import utils.paging as paging
+import utils.vector as vector
+from utils.remote_config import DocumentCache
+from utils.schema import RSI, RSI_SCHEMA
+from utils.subscribers import registry
+
+logger = logging.getLogger(__name__)
 
 
 def task_set_keep_alive_web_server():
-    requests.get(api.WEBSERVER)
+    func.http_session.get(api.WEBSERVER, timeout=func.HTTP_TIMEOUT)
+
+
+def task_prefetch_carousel():
+    func.refresh_carousel_bundle()
+
+
+def task_publish_snapshots():
+    # Keep the shared snapshots fresh even when this process serves no request.
+    for market in settings.MARKETS:
+        func.scanner_snapshots[market].get()
+
+
+class AlertEngine:
+    """
+    Stateful alert evaluation that only reports what changed since the last run.
+
+    For every symbol it remembers the active signal ('⬇' overbought, '⬆' oversold)
+    and when it was last pushed. ``update`` compares a new set of readings with that
+    state and returns the transitions:
+
+    - ``entered``: the symbol reached the alert value,
+    - ``flipped``: an active symbol now alerts in the other direction,
+    - ``exited``: fewer than ``alert value - hysteresis`` timeframes still agree.
+
+    A transition for a symbol pushed less than ``cooldown`` seconds ago is held back
+    and re-evaluated on the next run, so flapping symbols don't spam subscribers. An
+    exited symbol is kept as a tombstone (signal None) for that long, so the cooldown
+    also holds back its re-entry.
+    """
+
+    def __init__(self, hysteresis=0, cooldown=0, state_file=None):
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.state_file = state_file
+        self._state = self._load()
+
+    def update(self, readings: dict, alert_value: int, now=None) -> dict:
+        """
+        Apply new readings and return the transitions to push, keyed by symbol.
+        """
+        now = time.time() if now is None else now
+        changes = {}
+
+        for name, reading in readings.items():
+            previous = self._state.get(name)
+            active = previous['signal'] if previous is not None else None
+            overbought, oversold = reading['overbought'], reading['oversold']
+
+            transition = signal = None
+            if overbought >= alert_value or oversold >= alert_value:
+                signal = '⬇' if overbought > oversold else '⬆'
+                if active is None:
+                    transition = 'entered'
+                elif active != signal:
+                    transition = 'flipped'
+            elif active is not None:
+                agreeing = overbought if active == '⬇' else oversold
+                if agreeing < alert_value - self.hysteresis:
+                    transition = 'exited'
+
+            if transition is None:
+                continue
+            if previous is not None and now - previous['last_sent'] < self.cooldown:
+                continue
+
+            if transition == 'exited':
+                signal = active
+                self._state[name] = {'signal': None, 'last_sent': now}
+            else:
+                self._state[name] = {'signal': signal, 'last_sent': now}
+
+            changes[name] = {
+                'symbol': reading['symbol'],
+                'signal': signal,
+                'description': reading['description'],
+                'transition': transition,
+            }
+
+        # Tombstones past the cooldown no longer hold anything back.
+        expired = [name for name, state in self._state.items()
+                   if state['signal'] is None and now - state['last_sent'] >= self.cooldown]
+        for name in expired:
+            del self._state[name]
+
+        if changes or expired:
+            self._save()
+        return changes
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'Could not load alert state from {self.state_file}: {e}')
+            return {}
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            with open(f'{self.state_file}.tmp', 'w') as f:
+                json.dump(self._state, f)
+            os.replace(f'{self.state_file}.tmp', self.state_file)
+        except OSError as e:
+            logger.warning(f'Could not persist alert state to {self.state_file}: {e}')
+
+
+indicator_config = DocumentCache('settings', 'INDICATOR', ttl=settings.ALERT_CONFIG_TTL)
+
+alert_engine = AlertEngine(
+    hysteresis=settings.ALERT_HYSTERESIS,
+    cooldown=settings.ALERT_COOLDOWN,
+    state_file=settings.ALERT_STATE_FILE,
+)
 
 
 def task_alert_trade():
-    data = func.get_info(is_task=True)
-    forex_entries = data.get('data', [])
+    alert_value = _get_alert_value()
+
+    # Markets are fetched concurrently, with the RSI columns only, and each is alerted
+    # on as soon as its data arrives.
+    for market, data in func.iter_market_data(schema=RSI_SCHEMA):
+        forex_entries = data.get('data', [])
+
+        if not forex_entries:
+            logger.warning(f'No {market} data found!')
+            continue
+
+        _alert_market(forex_entries, alert_value)
 
-    if not forex_entries:
-        return {'error': 'Data not found!'}
 
-    forex_info = _extract_forex_info(forex_entries)
+def _alert_market(forex_entries, alert_value):
+    readings = _extract_forex_info(forex_entries)
 
-    # Breaking down the info into chunks of 12
-    chunks = _split_into_chunks(forex_info, settings.MAXIMUM_ITEMS)
+    if settings.ALERT_ONLY_CHANGES:
+        forex_info = alert_engine.update(readings, alert_value)
+    else:
+        forex_info = {
+            name: {'symbol': reading['symbol'], 'signal': reading['signal'], 'description': reading['description']}
+            for name, reading in readings.items()
+            if reading['overbought'] >= alert_value or reading['oversold'] >= alert_value
+        }
 
-    all_carousels = [
-        json.dumps({
-            "type": "carousel",
-            "contents": [template.alert_indicator(instance) for _, instance in chunk.items()]
-        })
-        for chunk in chunks
-    ]
+    # Page the alert bubbles into carousels of 12
+    if settings.FLEX_PRECOMPILED:
+        bubbles = (compiler.render_alert(instance) for instance in forex_info.values())
+    else:
+        bubbles = (json.dumps(template.alert_indicator(instance)) for instance in forex_info.values())
+    all_carousels = list(paging.carousels(bubbles))
 
-    func.compile_message(settings.ADMIN_ID, all_carousels, is_task=True)
+    if all_carousels:
+        func.broadcast_message(registry.all(), all_carousels)
 
 
-def _extract_forex_info(forex_entries):
+def _get_alert_value():
     from main import app
-    db = firestore.client()
-    doc_ref = db.collection('settings').document('INDICATOR')
-    fb_config = doc_ref.get().to_dict()
+    alert_value = indicator_config.get('maximum_indicator', settings.ALERT_VALUE_INDICATOR)
+    app.logger.info(f'Alert Value: {alert_value}')
+    return alert_value
+
 
+def _extract_forex_info(forex_entries, schema=RSI_SCHEMA):
+    """
+    Summarize the RSI state of every symbol, from rows fetched with ``schema``.
+
+    Returns:
+        dict: Per symbol, its overbought/oversold timeframe counts and the signal it would alert with.
+    """
     forex_info = {}
-    alert_value = fb_config.get('maximum_indicator', settings.ALERT_VALUE_INDICATOR)
-    app.logger.info(f'Alert Value: {alert_value}')
 
-    for entry in forex_entries:
+    if settings.VECTORIZED_ENGINE:
+        matrix = vector.load_matrix([entry.get('d') for entry in forex_entries], schema)
+        overbought, oversold = vector.alert_masks(matrix, schema)
+        masks = zip(overbought.tolist(), oversold.tolist())
+    else:
+        rsi_offsets = schema.offsets(RSI)
+        masks = (
+            ([entry.get('d')[i] >= settings.OVERBOUGHT for i in rsi_offsets],
+             [entry.get('d')[i] <= settings.OVERSOLD for i in rsi_offsets])
+            for entry in forex_entries
+        )
+
+    for entry, (is_overbought, is_oversold) in zip(forex_entries, masks):
         currency = entry.get('s')
-        indicator = entry.get('d')[:8]
+        name, desc, _, _ = func.get_currency_pair_description(currency)
+        overbought_count, oversold_count = sum(is_overbought), sum(is_oversold)
 
-        is_overbought = sum(1 for x in indicator if x >= settings.OVERBOUGHT)
-        is_oversold = sum(1 for x in indicator if x <= settings.OVERSOLD)
-
-        if is_overbought >= alert_value or is_oversold >= alert_value:
-            name, desc, _, _ = func.get_currency_pair_description(currency)
-            forex_info[name] = {
-                'symbol': name,
-                'signal': '⬇' if is_overbought > is_oversold else '⬆',
-                'description': desc,
-            }
+        forex_info[name] = {
+            'symbol': name,
+            'signal': '⬇' if overbought_count > oversold_count else '⬆',
+            'description': desc,
+            'overbought': overbought_count,
+            'oversold': oversold_count,
+        }
 
     return forex_info
 
-
-def _split_into_chunks(data, max_items):
-    return [dict(list(data.items())[i:i + max_items]) for i in range(0, len(data), max_items)]
@@ -0,0 +1,70 @@
+"""
+Vectorized evaluation of TradingView scanner indicators.
+
+The whole response is loaded into one ``symbols x columns`` float matrix laid out
+by a ``ColumnSchema``, so the overbought/oversold masks, trend counts and Fibonacci
+levels for every symbol are computed with a handful of array operations instead of
+per-value Python loops.
+"""
+
+import numpy as np
+
+import config.settings as settings
+from utils.schema import SCHEMA, RSI, MACD
+
+TRENDS = np.array(['DOWN TREND', 'NEURAL', 'UP TREND'])
+
+
+def load_matrix(indicators: list, schema=SCHEMA) -> np.ndarray:
+    """
+    Stack the ``d`` lists of the scanner entries into a 2-D float array.
+
+    Missing (``null``) values become NaN, which never compare as overbought,
+    oversold, positive or negative.
+
+    Raises:
+    - ValueError: If the rows are not as wide as ``schema``, i.e. were fetched with another one.
+    """
+    if not indicators:
+        return np.empty((0, len(schema)))
+    matrix = np.array(indicators, dtype=float)
+    if matrix.ndim != 2 or matrix.shape[1] != len(schema):
+        raise ValueError(f'Scanner rows do not match the {len(schema)} columns of the schema.')
+    return matrix
+
+
+def get_signals(matrix: np.ndarray, schema=SCHEMA) -> np.ndarray:
+    """
+    Vectorized ``get_signal``: the trend label of every row from its MACD columns.
+    """
+    macd = matrix[:, schema.offsets(MACD)]
+    balance = np.sign((macd > 0).sum(axis=1) - (macd < 0).sum(axis=1))
+    return TRENDS[balance + 1]
+
+
+def get_states(matrix: np.ndarray, schema=SCHEMA) -> tuple:
+    """
+    Vectorized ``get_status``: the (row, interval) positions of every overbought or oversold RSI value.
+
+    Returns:
+    - tuple: Row indices and interval indices, in row-major order.
+    """
+    rsi = matrix[:, schema.offsets(RSI)]
+    return np.nonzero((rsi >= settings.OVERBOUGHT) | (rsi <= settings.OVERSOLD))
+
+
+def get_fibo(matrix: np.ndarray, schema=SCHEMA) -> np.ndarray:
+    """
+    Vectorized ``extract_fibo``: Fibonacci levels shaped ``rows x intervals x levels``.
+    """
+    offsets = [list(schema.fibo_offsets(interval).values()) for interval in settings.INTERVAL]
+    return matrix[:, offsets]
+
+
+def alert_masks(matrix: np.ndarray, schema=SCHEMA) -> tuple:
+    """
+    Overbought and oversold RSI masks shaped ``rows x intervals``.
+    """
+    rsi = matrix[:, schema.offsets(RSI)]
+    return rsi >= settings.OVERBOUGHT, rsi <= settings.OVERSOLD
+